@@ -4,15 +4,19 @@ Enhanced MRI Trial Balance Import System
 Flask API implementing Excel Trial Balance Conversion Tool functionality
 """
 
-from flask import Flask, request, jsonify, send_file, render_template
+from flask import Flask, Response, request, jsonify, send_file, render_template
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from pathlib import Path
 import os
+import gzip
+import shutil
+import hashlib
 import tempfile
 import logging
 import json
 import uuid
+import pandas as pd
 from datetime import datetime
 
 # Import the processor - handle import path issues
@@ -20,7 +24,13 @@ import sys
 sys.path.append(str(Path(__file__).parent))
 
 # Import the working processor
-from simple_processor import SimpleTrialBalanceProcessor as EnhancedTrialBalanceProcessor
+from simple_processor import SimpleTrialBalanceProcessor as EnhancedTrialBalanceProcessor, MRI_IMPORT_COLUMNS
+from src.engines.mri_import_generator import MRIImportGenerator
+from src.engines.account_mapping_engine import AccountMappingEngine
+from src.engines.excel_report_writer import ExcelReportWriter
+from src.validators.validation_engine import ValidationEngine
+from src.core.upload_store import ChunkedUploadStore, UploadError
+from src.core.admission_control import AdmissionController, AdmissionRejected
 
 app = Flask(__name__)
 CORS(app)
@@ -46,9 +56,44 @@ UPLOAD_FOLDER = BASE_DIR / 'temp'
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
 
+# Outputs a /api/process caller can ask for, and the error reported for each failed stage
+PROCESS_OUTPUTS = {'import', 'validation', 'summary'}
+STAGE_ERRORS = {
+    'load': ('Failed to load trial balance data. Please check file format and content.', 400),
+    'clean': ('Failed to load trial balance data. Please check file format and content.', 400),
+    'activity': ('Failed to calculate account activity. Please verify account mappings.', 400),
+    'map': ('Failed to calculate account activity. Please verify account mappings.', 400),
+    'generate': ('Failed to generate MRI import file.', 400),
+    'export': ('Failed to export MRI import file.', 500)
+}
+
+# Mapping engine (and its suggestion index) is built once at startup
+mapping_engine = AccountMappingEngine(BASE_DIR / 'data' / 'mappings')
+
 # Configure maximum file size (50MB)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024
 
+def load_system_config():
+    """Load system configuration, falling back to defaults if unavailable"""
+    try:
+        with open(BASE_DIR / 'config' / 'system_config.json', 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not load system config: {e}")
+        return {}
+
+# Resumable chunked uploads; finalized files can be passed to /api/process by id
+upload_config = load_system_config().get('chunked_uploads', {})
+upload_store = ChunkedUploadStore(
+    BASE_DIR / upload_config.get('directory', 'temp/uploads'),
+    upload_config.get('chunk_size_mb', 8) * 1024 * 1024,
+    upload_config.get('max_file_size_mb', 2048) * 1024 * 1024,
+    app.config['MAX_CONTENT_LENGTH']
+)
+
+# Global memory/concurrency budget for processing runs (shared with pre-forked workers)
+admission = AdmissionController(load_system_config().get('admission_control', {}))
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -62,6 +107,243 @@ def cleanup_temp_files(*file_paths):
         except Exception as e:
             logger.warning(f"Could not delete temp file {file_path}: {e}")
 
+def materialize_upload_ref(file_id, field, session_id):
+    """Link a finalized chunked upload into the temp folder as one run's input file"""
+    stored = upload_store.get_file(file_id)
+    if stored is None:
+        raise UploadError(f'Unknown uploaded file {file_id}', 404)
+    if not allowed_file(stored.name):
+        raise UploadError('Invalid file type for uploaded file. Please upload CSV or Excel file.')
+    return upload_store.materialize(file_id, UPLOAD_FOLDER / f"{field}_{session_id}_{secure_filename(stored.name)}")
+
+def parse_process_options(values):
+    """
+    Period, entity, requested outputs and delivery mode of a /api/process request
+    
+    Returns:
+        (options, None), or (None, (error message, status)) for an invalid request
+    """
+    period = values.get('period', '')
+    entity_id = values.get('entity_id', '')
+    
+    if not period:
+        return None, ('Period is required (format: MM/YY)', 400)
+    
+    # Only the stages behind the requested outputs are computed
+    outputs = {o.strip() for o in values.get('outputs', 'import,validation,summary').split(',') if o.strip()}
+    if not outputs or outputs - PROCESS_OUTPUTS:
+        return None, (f'Invalid outputs. Choose from: {", ".join(sorted(PROCESS_OUTPUTS))}', 400)
+    
+    return {
+        'period': period,
+        'entity_id': entity_id,
+        'outputs': outputs,
+        'inline': values.get('delivery') == 'inline'
+    }, None
+
+def process_saved_uploads(prior_path, current_path, session_id, options):
+    """
+    Run the stages behind the requested outputs for trial balances saved to disk
+    
+    Shared by the Flask routes and the ASGI service (asgi_app.py); the input files are
+    removed afterwards.
+    
+    Returns:
+        (body, status, headers) - body is a JSON-serializable dict, or for inline
+        delivery an iterator over the MRI import CSV
+    """
+    period = options['period']
+    entity_id = options['entity_id']
+    outputs = options['outputs']
+    inline = options['inline']
+    
+    try:
+        output_filename = f'mri_import_{session_id}.csv'
+        output_path = UPLOAD_FOLDER / output_filename
+        
+        # Initialize processor and its stage graph
+        system_config = load_system_config()
+        chunk_rows = system_config.get('file_settings', {}).get('export_chunk_rows', 10000)
+        processor = EnhancedTrialBalanceProcessor(
+            mapping_engine.get_entity_overlay(entity_id), chunk_rows, system_config.get('processing_rules', {})
+        )
+        graph = processor.build_stage_graph(prior_path, current_path, period, entity_id, output_path)
+        
+        required_stages = ['map']
+        if 'import' in outputs or inline:
+            required_stages.append('generate')
+        
+        for stage in required_stages:
+            if not graph.run(stage):
+                message, status = STAGE_ERRORS[graph.failed_stage]
+                return {'error': message}, status, {}
+        
+        # Run validation
+        validation_passed = graph.run('validate') if 'validation' in outputs else None
+        
+        # Inline delivery streams the import straight into the response
+        if inline:
+            logger.info(f"Streaming MRI import inline for session {session_id}")
+            
+            headers = {
+                'Content-Disposition': f'attachment; filename=mri_import_{session_id}.csv',
+                'X-Session-ID': session_id
+            }
+            if validation_passed is not None:
+                headers['X-Validation-Passed'] = str(validation_passed).lower()
+            return processor.iter_mri_import_csv(period, entity_id, chunk_rows), 200, headers
+        
+        # Prepare response
+        response_data = {
+            'message': 'Processing completed successfully',
+            'session_id': session_id,
+            'period': period,
+            'entity_id': entity_id
+        }
+        
+        # Export MRI import file
+        if 'import' in outputs:
+            if not graph.run('export'):
+                message, status = STAGE_ERRORS['export']
+                return {'error': message}, status, {}
+            
+            publish_artifact(output_path)
+            response_data['download_url'] = f'/api/download/mri_import/{session_id}'
+        
+        # Store validation results and prepare download copies
+        if 'validation' in outputs:
+            validation_path = UPLOAD_FOLDER / f'validation_{session_id}.json'
+            with open(validation_path, 'w') as f:
+                json.dump(processor.validation_results, f, indent=2, default=str)
+            
+            publish_artifact(validation_path)
+            response_data['validation_passed'] = validation_passed
+            response_data['validation_results'] = processor.validation_results
+            response_data['validation_download_url'] = f'/api/download/validation/{session_id}'
+        
+        # Get processing summary
+        if 'summary' in outputs:
+            response_data['summary'] = processor.get_processing_summary()
+        
+        response_data['stages'] = graph.get_computed_stages()
+        
+        logger.info(f"Processing completed for session {session_id}")
+        return response_data, 200, {}
+    
+    finally:
+        # Clean up input files
+        cleanup_temp_files(prior_path, current_path)
+
+def run_admitted(prior_path, current_path, session_id, options):
+    """
+    process_saved_uploads within the admission budget
+    
+    Raises:
+        AdmissionRejected: no capacity; the input files are left for the caller to remove
+    """
+    reservation = admission.acquire(admission.estimate([prior_path, current_path]))
+    return run_reserved(reservation, prior_path, current_path, session_id, options)
+
+def run_reserved(reservation, prior_path, current_path, session_id, options):
+    """
+    process_saved_uploads for a run already admitted with the given reservation
+    
+    The reservation is released when the run fails or returns JSON, or once an inline
+    CSV stream has been sent.
+    """
+    try:
+        body, status, headers = process_saved_uploads(prior_path, current_path, session_id, options)
+    except Exception:
+        admission.release(reservation)
+        raise
+    
+    if isinstance(body, dict):
+        admission.release(reservation)
+        return body, status, headers
+    return admission.release_after(body, reservation), status, headers
+
+def busy_response(error):
+    """429 answer for a run that admission control turned away"""
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def validate_saved_upload(file_path):
+    """
+    Check the structure of a trial balance saved to disk; the file is removed afterwards
+    
+    Returns:
+        (body, status)
+    """
+    try:
+        # Only the load stage is needed to check the structure
+        processor = EnhancedTrialBalanceProcessor()
+        graph = processor.build_stage_graph(file_path)
+        result = processor.prior_tb if graph.run('load') else None
+        
+        if result is not None:
+            return {
+                'message': 'File structure is valid',
+                'details': {
+                    'accounts_found': len(result),
+                    'columns_found': list(result.columns),
+                    'format': 'Valid trial balance format'
+                }
+            }, 200
+        else:
+            return {'error': 'Invalid file structure. Please check format and content.'}, 400
+    
+    finally:
+        cleanup_temp_files(file_path)
+
+def publish_artifact(file_path):
+    """Store a gzip copy and a content-hash ETag next to a download artifact"""
+    file_path = Path(file_path)
+    digest = hashlib.sha256()
+    
+    with open(file_path, 'rb') as src, open(f'{file_path}.gz', 'wb') as raw:
+        with gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as dst:
+            for block in iter(lambda: src.read(1024 * 1024), b''):
+                digest.update(block)
+                dst.write(block)
+    
+    etag = digest.hexdigest()
+    Path(f'{file_path}.etag').write_text(etag)
+    return etag
+
+def send_artifact(file_path, mimetype, download_name):
+    """Send an artifact with gzip negotiation, ETag/If-None-Match and range support"""
+    file_path = Path(file_path)
+    etag_path = Path(f'{file_path}.etag')
+    gzip_path = Path(f'{file_path}.gz')
+    
+    # Artifacts written before publishing existed get their copies on first download
+    etag = etag_path.read_text().strip() if etag_path.exists() and gzip_path.exists() else publish_artifact(file_path)
+    
+    if request.accept_encodings['gzip'] > 0:
+        response = send_file(
+            gzip_path,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name,
+            etag=f'{etag}-gzip',
+            conditional=True
+        )
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_file(
+            file_path,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name,
+            etag=etag,
+            conditional=True
+        )
+    
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 @app.errorhandler(413)
 def file_too_large(error):
     """Handle file too large error"""
@@ -81,36 +363,52 @@ def index():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    health = {
         'status': 'healthy',
         'service': 'MRI Trial Balance Import System',
         'version': '1.0.0',
         'timestamp': datetime.now().isoformat()
-    })
+    }
+    
+    # Processing capacity in use
+    health['admission'] = admission.usage()
+    
+    # Per-worker status when served by prefork_server.py
+    worker_health = app.config.get('WORKER_HEALTH')
+    if worker_health is not None:
+        health['pid'] = os.getpid()
+        health['workers'] = worker_health()
+    
+    return jsonify(health)
 
 @app.route('/api/process', methods=['POST'])
 def process_trial_balances():
     """Process trial balances and generate MRI import file"""
-    prior_path = None
-    current_path = None
+    paths = {}
     
     try:
+        # Each trial balance is a file in the request or the id of a finalized chunked upload
+        inputs = {}
+        for field in ['prior_tb', 'current_tb']:
+            if field in request.files:
+                inputs[field] = request.files[field]
+            elif request.form.get(field):
+                inputs[field] = request.form[field]
+        
         # Validate request
-        if 'prior_tb' not in request.files or 'current_tb' not in request.files:
+        if len(inputs) < 2:
             return jsonify({'error': 'Both prior and current trial balance files are required'}), 400
         
-        # Get additional parameters
-        period = request.form.get('period', '')
-        entity_id = request.form.get('entity_id', '')
-        
-        if not period:
-            return jsonify({'error': 'Period is required (format: MM/YY)'}), 400
-        
-        prior_file = request.files['prior_tb']
-        current_file = request.files['current_tb']
+        options, error = parse_process_options(request.values)
+        if error:
+            message, status = error
+            return jsonify({'error': message}), status
         
         # Validate files
-        for file, name in [(prior_file, 'prior'), (current_file, 'current')]:
+        for field, name in [('prior_tb', 'prior'), ('current_tb', 'current')]:
+            file = inputs[field]
+            if isinstance(file, str):
+                continue
             if file.filename == '':
                 return jsonify({'error': f'No {name} period file selected'}), 400
             if not allowed_file(file.filename):
@@ -119,72 +417,92 @@ def process_trial_balances():
         # Save files temporarily
         session_id = str(uuid.uuid4())[:8]
         
-        prior_filename = f"prior_tb_{session_id}_{secure_filename(prior_file.filename)}"
-        current_filename = f"current_tb_{session_id}_{secure_filename(current_file.filename)}"
-        
-        prior_path = UPLOAD_FOLDER / prior_filename
-        current_path = UPLOAD_FOLDER / current_filename
-        
-        prior_file.save(prior_path)
-        current_file.save(current_path)
-        
-        logger.info(f"Processing session {session_id}: {prior_filename}, {current_filename}")
-        
-        # Initialize processor
-        processor = EnhancedTrialBalanceProcessor()
-        
-        # Load trial balances
-        if not processor.load_trial_balances(prior_path, current_path):
-            cleanup_temp_files(prior_path, current_path)
-            return jsonify({'error': 'Failed to load trial balance data. Please check file format and content.'}), 400
-        
-        # Calculate activity with mapping
-        if not processor.calculate_activity_with_mapping():
-            cleanup_temp_files(prior_path, current_path)
-            return jsonify({'error': 'Failed to calculate account activity. Please verify account mappings.'}), 400
-        
-        # Generate MRI import file
-        if not processor.generate_mri_import_file(period, entity_id):
-            cleanup_temp_files(prior_path, current_path)
-            return jsonify({'error': 'Failed to generate MRI import file.'}), 400
-        
-        # Run validation
-        validation_passed = processor.run_comprehensive_validation()
+        for field, file in inputs.items():
+            if isinstance(file, str):
+                paths[field] = materialize_upload_ref(file, field, session_id)
+            else:
+                paths[field] = UPLOAD_FOLDER / f"{field}_{session_id}_{secure_filename(file.filename)}"
+                file.save(paths[field])
         
-        # Export MRI import file
-        output_filename = f'mri_import_{session_id}.csv'
-        output_path = UPLOAD_FOLDER / output_filename
+        prior_path = paths['prior_tb']
+        current_path = paths['current_tb']
         
-        if not processor.export_mri_import_file(output_path, period, entity_id):
-            cleanup_temp_files(prior_path, current_path)
-            return jsonify({'error': 'Failed to export MRI import file.'}), 500
+        logger.info(f"Processing session {session_id}: {prior_path.name}, {current_path.name}")
         
-        # Get processing summary
-        summary = processor.get_processing_summary()
+        body, status, headers = run_admitted(prior_path, current_path, session_id, options)
+        if isinstance(body, dict):
+            return jsonify(body), status
         
-        # Clean up input files
-        cleanup_temp_files(prior_path, current_path)
+        response = Response(body, mimetype='text/csv')
+        response.headers.update(headers)
+        return response
         
-        # Prepare response
-        response_data = {
-            'message': 'Processing completed successfully',
-            'session_id': session_id,
-            'period': period,
-            'entity_id': entity_id,
-            'validation_passed': validation_passed,
-            'summary': summary,
-            'validation_results': processor.validation_results,
-            'download_url': f'/api/download/mri_import/{session_id}'
-        }
+    except UploadError as e:
+        cleanup_temp_files(*paths.values())
+        return jsonify({'error': str(e)}), e.status
         
-        logger.info(f"Processing completed for session {session_id}")
-        return jsonify(response_data)
+    except AdmissionRejected as e:
+        cleanup_temp_files(*paths.values())
+        logger.warning(f"Processing request rejected: {e}")
+        return busy_response(e)
         
     except Exception as e:
-        cleanup_temp_files(prior_path, current_path)
+        cleanup_temp_files(*paths.values())
         logger.error(f"Error processing trial balances: {e}", exc_info=True)
         return jsonify({'error': f'Processing failed: {str(e)}'}), 500
 
+@app.route('/api/uploads', methods=['POST'])
+def initiate_upload():
+    """Start a resumable chunked upload"""
+    try:
+        data = request.get_json(silent=True) or {}
+        filename = data.get('filename', '')
+        if not filename or not allowed_file(filename):
+            return jsonify({'error': 'Invalid file type. Please upload CSV or Excel file.'}), 400
+        if 'size' not in data:
+            return jsonify({'error': 'File size is required'}), 400
+        
+        result = upload_store.initiate(filename, data['size'], data.get('chunk_size'), data.get('sha256'))
+        return jsonify(result), 201
+        
+    except (UploadError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), getattr(e, 'status', 400)
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload_status(upload_id):
+    """Progress of a chunked upload, including the chunks still missing"""
+    try:
+        return jsonify(upload_store.status(upload_id))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    """Store one chunk (raw request body), optionally verified by X-Chunk-SHA256"""
+    try:
+        result = upload_store.write_chunk(upload_id, index, request.get_data(), request.headers.get('X-Chunk-SHA256'))
+        return jsonify(result)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Verify the whole-file SHA-256 and store the upload for use in /api/process"""
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify(upload_store.finalize(upload_id, data.get('sha256', '')))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    """Discard an unfinished chunked upload"""
+    try:
+        upload_store.abort(upload_id)
+        return jsonify({'message': 'Upload aborted'})
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
 @app.route('/api/download/mri_import/<session_id>')
 def download_mri_import(session_id):
     """Download generated MRI import CSV"""
@@ -198,17 +516,125 @@ def download_mri_import(session_id):
         if not file_path.exists():
             return jsonify({'error': 'MRI import file not found or expired'}), 404
         
-        return send_file(
-            file_path,
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'mri_import_{session_id}.csv'
-        )
+        return send_artifact(file_path, 'text/csv', f'mri_import_{session_id}.csv')
         
     except Exception as e:
         logger.error(f"Error downloading MRI import file: {e}")
         return jsonify({'error': 'Failed to download file'}), 500
 
+@app.route('/api/download/mri_import/<session_id>/split')
+def download_split_mri_import(session_id):
+    """Download the MRI import split into size-bounded files as one zip archive"""
+    try:
+        # Validate session_id
+        if not session_id.isalnum() or len(session_id) != 8:
+            return jsonify({'error': 'Invalid session ID'}), 400
+        
+        file_path = UPLOAD_FOLDER / f'mri_import_{session_id}.csv'
+        
+        if not file_path.exists():
+            return jsonify({'error': 'MRI import file not found or expired'}), 404
+        
+        max_rows = request.args.get('max_rows', type=int)
+        max_bytes = request.args.get('max_bytes', type=int)
+        partition_by = request.args.get('partition_by')
+        if partition_by is not None:
+            partition_by = [col.strip().upper() for col in partition_by.split(',') if col.strip()]
+            invalid = [col for col in partition_by if col not in ('ENTITYID', 'PERIOD')]
+            if invalid:
+                return jsonify({'error': f'Cannot partition by {", ".join(invalid)}. Use ENTITYID and/or PERIOD.'}), 400
+        
+        # Keep the stored text exactly as exported
+        import_df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+        
+        generator = MRIImportGenerator(load_system_config())
+        base_name = f'mri_import_{session_id}'
+        
+        # Each request splits into its own directory, so concurrent splits of a session
+        # (possibly with other limits) never mix parts
+        work_dir = Path(tempfile.mkdtemp(prefix=f'{base_name}_split_', dir=UPLOAD_FOLDER))
+        try:
+            manifest = generator.export_split(import_df, work_dir, base_name, max_rows, max_bytes, partition_by)
+            if manifest is None:
+                return jsonify({'error': 'Failed to split MRI import file'}), 500
+            
+            archive_path = work_dir / f'{base_name}_split.zip'
+            if not generator.write_split_archive(manifest, work_dir, archive_path):
+                return jsonify({'error': 'Failed to build split archive'}), 500
+            
+            publish_artifact(archive_path)
+            return send_artifact(archive_path, 'application/zip', archive_path.name)
+        finally:
+            # send_file has already opened the archive, so it is still sent after removal;
+            # where open files cannot be removed, /api/cleanup collects the directory later
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+    except Exception as e:
+        logger.error(f"Error downloading split MRI import: {e}")
+        return jsonify({'error': 'Failed to download file'}), 500
+
+@app.route('/api/download/report/<session_id>')
+def download_excel_report(session_id):
+    """Download MRI import and validation results as one Excel workbook"""
+    try:
+        # Validate session_id
+        if not session_id.isalnum() or len(session_id) != 8:
+            return jsonify({'error': 'Invalid session ID'}), 400
+        
+        import_path = UPLOAD_FOLDER / f'mri_import_{session_id}.csv'
+        validation_path = UPLOAD_FOLDER / f'validation_{session_id}.json'
+        report_path = UPLOAD_FOLDER / f'mri_report_{session_id}.xlsx'
+        
+        if not import_path.exists():
+            return jsonify({'error': 'MRI import file not found or expired'}), 404
+        
+        if not report_path.exists():
+            system_config = load_system_config()
+            chunk_rows = system_config.get('file_settings', {}).get('export_chunk_rows', 10000)
+            
+            # Stream the stored import into the workbook chunk by chunk
+            text_columns = {col: str for col in MRI_IMPORT_COLUMNS if col != 'AMT'}
+            sheets = {
+                'MRI Import': pd.read_csv(import_path, dtype=text_columns, keep_default_na=False, chunksize=chunk_rows)
+            }
+            if validation_path.exists():
+                with open(validation_path, 'r') as f:
+                    validation_results = json.load(f)
+                sheets['Validation'] = ValidationEngine(system_config).get_validation_frame(validation_results)
+            
+            if not ExcelReportWriter(system_config).write_workbook(report_path, sheets, {'MRI Import': ['ENTRDATE']}):
+                return jsonify({'error': 'Failed to build Excel report'}), 500
+            publish_artifact(report_path)
+        
+        return send_artifact(
+            report_path,
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            report_path.name
+        )
+        
+    except Exception as e:
+        logger.error(f"Error downloading Excel report: {e}")
+        return jsonify({'error': 'Failed to download file'}), 500
+
+@app.route('/api/download/validation/<session_id>')
+def download_validation_results(session_id):
+    """Download validation results JSON"""
+    try:
+        # Validate session_id
+        if not session_id.isalnum() or len(session_id) != 8:
+            return jsonify({'error': 'Invalid session ID'}), 400
+        
+        file_path = UPLOAD_FOLDER / f'validation_{session_id}.json'
+        
+        if not file_path.exists():
+            return jsonify({'error': 'Validation results not found or expired'}), 404
+        
+        return send_artifact(file_path, 'application/json', f'validation_{session_id}.json')
+        
+    except Exception as e:
+        logger.error(f"Error downloading validation results: {e}")
+        return jsonify({'error': 'Failed to download file'}), 500
+
 @app.route('/api/validate', methods=['POST'])
 def validate_file():
     """Validate uploaded file structure"""
@@ -232,25 +658,8 @@ def validate_file():
         
         file.save(file_path)
         
-        # Initialize processor for validation
-        processor = EnhancedTrialBalanceProcessor(BASE_DIR)
-        
-        # Try to load the file
-        result = processor._load_trial_balance_file(file_path, "Validation")
-        
-        cleanup_temp_files(file_path)
-        
-        if result is not None:
-            return jsonify({
-                'message': 'File structure is valid',
-                'details': {
-                    'accounts_found': len(result),
-                    'columns_found': list(result.columns),
-                    'format': 'Valid trial balance format'
-                }
-            })
-        else:
-            return jsonify({'error': 'Invalid file structure. Please check format and content.'}), 400
+        body, status = validate_saved_upload(file_path)
+        return jsonify(body), status
         
     except Exception as e:
         cleanup_temp_files(file_path)
@@ -280,6 +689,41 @@ def get_account_mappings():
         logger.error(f"Error getting account mappings: {e}")
         return jsonify({'error': 'Failed to load account mappings'}), 500
 
+@app.route('/api/mappings/suggest', methods=['POST'])
+def suggest_account_mappings():
+    """Suggest candidate MRI accounts for unmapped source accounts"""
+    try:
+        data = request.get_json(silent=True) or {}
+        accounts = data.get('accounts', [])
+        
+        if not accounts or not isinstance(accounts, list):
+            return jsonify({'error': 'Provide a list of accounts (codes or {"account", "description"} objects)'}), 400
+        
+        # Accept plain account strings or objects carrying a description
+        descriptions = {}
+        source_accounts = []
+        for item in accounts:
+            if isinstance(item, dict):
+                source_accounts.append(str(item.get('account', '')))
+                descriptions[source_accounts[-1]] = str(item.get('description', ''))
+            else:
+                source_accounts.append(str(item))
+        
+        suggestion_config = load_system_config().get('mapping_suggestions', {})
+        k = int(data.get('k', suggestion_config.get('top_k', 3)))
+        min_score = float(data.get('min_score', suggestion_config.get('min_score', 0.0)))
+        
+        return jsonify({
+            'suggestions': mapping_engine.suggest_mappings(source_accounts, descriptions, k, min_score),
+            'k': k
+        })
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid suggestion request: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Error suggesting account mappings: {e}")
+        return jsonify({'error': 'Failed to suggest account mappings'}), 500
+
 @app.route('/api/config', methods=['GET'])
 def get_system_config():
     """Get system configuration"""
@@ -324,6 +768,15 @@ def cleanup_old_files():
                     except Exception as e:
                         logger.warning(f"Could not delete old file {file_path}: {e}")
         
+        # Split work directories left behind by interrupted downloads
+        for work_dir in UPLOAD_FOLDER.glob('mri_import_*_split_*'):
+            if work_dir.is_dir() and current_time - work_dir.stat().st_mtime > 3600:
+                shutil.rmtree(work_dir, ignore_errors=True)
+                cleanup_count += 1
+        
+        # Unfinished and unused chunked uploads
+        cleanup_count += upload_store.cleanup(upload_config.get('retention_hours', 24) * 3600)
+        
         return jsonify({
             'message': 'Cleanup completed',
             'files_removed': cleanup_count
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+ASGI Service
+Async variant of the Flask API: uploads are received without blocking, and the
+CPU-bound processing pipeline runs on a dedicated executor
+"""
+
+import uuid
+import shutil
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.utils import secure_filename
+
+import app as flask_api
+from src.core.upload_store import UploadError
+from src.core.admission_control import AdmissionRejected
+
+
+# Defaults for the 'asgi' section of system_config.json
+ASGI_DEFAULTS = {
+    'host': '0.0.0.0',
+    'port': 8000,
+    'processing_workers': 4
+}
+
+logger = logging.getLogger('asgi_app')
+
+config = {**ASGI_DEFAULTS, **flask_api.load_system_config().get('asgi', {})}
+
+# Pipeline runs get their own threads, so slow uploads (handled on the event loop) and
+# the pool Starlette uses for file I/O never compete with processing for workers. There is
+# a thread for every run admission control lets through, so admitted runs never wait.
+processing_executor = ThreadPoolExecutor(
+    max_workers=max(config['processing_workers'], flask_api.admission.max_concurrent),
+    thread_name_prefix='processing'
+)
+
+# Runs wait for admission on their own threads before reaching the processing executor,
+# so waiting runs are counted (and rejected) by admission control, not queued unseen.
+# Waits never outnumber the admission queue; a full queue rejects without blocking.
+admission_executor = ThreadPoolExecutor(
+    max_workers=flask_api.admission.max_queued + flask_api.admission.max_concurrent,
+    thread_name_prefix='admission'
+)
+
+
+def json_response(body, status=200, headers=None):
+    """JSON response encoded like Flask's jsonify, so both services return identical bodies"""
+    return Response(flask_api.app.json.dumps(body), status, headers, media_type='application/json')
+
+
+async def run_processing(func, *args):
+    """Run CPU-bound work on the processing executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(processing_executor, func, *args)
+
+
+async def admit(paths):
+    """Reserve admission budget for a run over the given input files"""
+    admission = flask_api.admission
+    cost = admission.estimate(paths)
+    future = asyncio.get_running_loop().run_in_executor(admission_executor, admission.acquire, cost)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # Client went away while queued: hand back the reservation once the wait ends
+        future.add_done_callback(
+            lambda done: done.exception() is None and admission.release(done.result())
+        )
+        raise
+
+
+async def iterate_processing(iterator):
+    """Drain a blocking iterator (e.g. the inline CSV export) on the processing executor"""
+    done = object()
+    try:
+        while True:
+            chunk = await run_processing(next, iterator, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        # Also runs when the client disconnects mid-stream
+        if hasattr(iterator, 'close'):
+            iterator.close()
+
+
+class BodyTooLarge(Exception):
+    """The request body passed MAX_CONTENT_LENGTH while it was streaming in"""
+
+
+def too_large(request) -> bool:
+    """Reject bodies over MAX_CONTENT_LENGTH before reading them"""
+    length = request.headers.get('content-length')
+    return length is not None and length.isdigit() and int(length) > flask_api.app.config['MAX_CONTENT_LENGTH']
+
+
+def limit_body(request) -> Request:
+    """
+    The request, with a body stream that raises BodyTooLarge past MAX_CONTENT_LENGTH
+    
+    too_large() can only trust a declared Content-Length; bodies sent with chunked
+    transfer encoding are measured here, as they arrive.
+    """
+    limit = flask_api.app.config['MAX_CONTENT_LENGTH']
+    received = 0
+    
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message['type'] == 'http.request':
+            received += len(message.get('body', b''))
+            if received > limit:
+                raise BodyTooLarge()
+        return message
+    
+    return Request(request.scope, receive)
+
+
+async def save_upload(upload, path):
+    """Copy a received upload (spooled while it streamed in) to the temp folder"""
+    def copy():
+        upload.file.seek(0)
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(upload.file, f, 1024 * 1024)
+    
+    await run_in_threadpool(copy)
+
+
+async def process_trial_balances(request):
+    """Process trial balances and generate MRI import file (async /api/process)"""
+    paths = {}
+    
+    if too_large(request):
+        return json_response({'error': 'File too large. Maximum size is 50MB.'}, 413)
+    request = limit_body(request)
+    
+    try:
+        # Multipart bodies are parsed as they arrive, chunk by chunk, without a worker thread
+        async with request.form(max_files=2) as form:
+            values = {**request.query_params, **{k: v for k, v in form.items() if isinstance(v, str)}}
+            
+            # Each trial balance is a file in the request or the id of a finalized chunked upload
+            inputs = {field: form.get(field) for field in ['prior_tb', 'current_tb'] if form.get(field)}
+            if len(inputs) < 2:
+                return json_response({'error': 'Both prior and current trial balance files are required'}, 400)
+            
+            options, error = flask_api.parse_process_options(values)
+            if error:
+                message, status = error
+                return json_response({'error': message}, status)
+            
+            # Validate files
+            for field, name in [('prior_tb', 'prior'), ('current_tb', 'current')]:
+                file = inputs[field]
+                if not isinstance(file, UploadFile):
+                    continue
+                if not file.filename:
+                    return json_response({'error': f'No {name} period file selected'}, 400)
+                if not flask_api.allowed_file(file.filename):
+                    return json_response(
+                        {'error': f'Invalid file type for {name} period. Please upload CSV or Excel file.'},
+                        400
+                    )
+            
+            # Save files temporarily
+            session_id = str(uuid.uuid4())[:8]
+            for field, file in inputs.items():
+                if isinstance(file, UploadFile):
+                    paths[field] = flask_api.UPLOAD_FOLDER / f"{field}_{session_id}_{secure_filename(file.filename)}"
+                    await save_upload(file, paths[field])
+                else:
+                    paths[field] = await run_in_threadpool(flask_api.materialize_upload_ref, file, field, session_id)
+        
+        prior_path = paths['prior_tb']
+        current_path = paths['current_tb']
+        
+        logger.info(f"Processing session {session_id}: {prior_path.name}, {current_path.name}")
+        
+        reservation = await admit([prior_path, current_path])
+        body, status, headers = await run_processing(
+            flask_api.run_reserved, reservation, prior_path, current_path, session_id, options
+        )
+        if isinstance(body, dict):
+            return json_response(body, status)
+        
+        return StreamingResponse(iterate_processing(iter(body)), media_type='text/csv', headers=headers)
+    
+    except BodyTooLarge:
+        flask_api.cleanup_temp_files(*paths.values())
+        return json_response({'error': 'File too large. Maximum size is 50MB.'}, 413)
+    
+    except HTTPException as e:
+        # Malformed multipart body or too many files
+        flask_api.cleanup_temp_files(*paths.values())
+        return json_response({'error': e.detail}, e.status_code)
+    
+    except UploadError as e:
+        flask_api.cleanup_temp_files(*paths.values())
+        return json_response({'error': str(e)}, e.status)
+    
+    except AdmissionRejected as e:
+        flask_api.cleanup_temp_files(*paths.values())
+        logger.warning(f"Processing request rejected: {e}")
+        return json_response({'error': str(e), 'retry_after': e.retry_after}, 429, {'Retry-After': str(e.retry_after)})
+    
+    except Exception as e:
+        flask_api.cleanup_temp_files(*paths.values())
+        logger.error(f"Error processing trial balances: {e}", exc_info=True)
+        return json_response({'error': f'Processing failed: {str(e)}'}, 500)
+
+
+async def validate_file(request):
+    """Validate uploaded file structure (async /api/validate)"""
+    file_path = None
+    
+    if too_large(request):
+        return json_response({'error': 'File too large. Maximum size is 50MB.'}, 413)
+    request = limit_body(request)
+    
+    try:
+        async with request.form(max_files=1) as form:
+            file = form.get('file')
+            if not isinstance(file, UploadFile):
+                return json_response({'error': 'No file uploaded'}, 400)
+            if not file.filename:
+                return json_response({'error': 'No file selected'}, 400)
+            if not flask_api.allowed_file(file.filename):
+                return json_response({'error': 'Invalid file type. Please upload CSV or Excel file.'}, 400)
+            
+            temp_id = str(uuid.uuid4())[:8]
+            file_path = flask_api.UPLOAD_FOLDER / f"temp_validate_{temp_id}_{secure_filename(file.filename)}"
+            await save_upload(file, file_path)
+        
+        body, status = await run_processing(flask_api.validate_saved_upload, file_path)
+        return json_response(body, status)
+    
+    except BodyTooLarge:
+        flask_api.cleanup_temp_files(file_path)
+        return json_response({'error': 'File too large. Maximum size is 50MB.'}, 413)
+    
+    except Exception as e:
+        flask_api.cleanup_temp_files(file_path)
+        logger.error(f"Error validating file: {e}")
+        return json_response({'error': 'File validation failed. Please check file format.'}, 400)
+
+
+def shutdown():
+    """Let running pipeline jobs finish"""
+    admission_executor.shutdown(wait=True)
+    processing_executor.shutdown(wait=True)
+
+
+# Upload routes are served natively; every other route is the Flask app, run in a thread
+app = Starlette(
+    routes=[
+        Route('/api/process', process_trial_balances, methods=['POST']),
+        Route('/api/validate', validate_file, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_api.app))
+    ],
+    on_shutdown=[shutdown]
+)
+
+
+def main():
+    """Serve the ASGI app with uvicorn"""
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description='Serve the MRI Trial Balance API (ASGI)')
+    parser.add_argument('--host', default=config['host'])
+    parser.add_argument('--port', type=int, default=config['port'])
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    args = parser.parse_args()
+    
+    uvicorn.run('asgi_app:app', host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
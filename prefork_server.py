@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Pre-fork Server
+Production serving mode for the Flask API: one master process preloads the
+application, then forks worker processes that serve requests from a shared socket
+"""
+
+import os
+import gc
+import sys
+import time
+import random
+import signal
+import socket
+import ctypes
+import logging
+import argparse
+from pathlib import Path
+from multiprocessing.sharedctypes import RawArray
+from typing import Dict, List
+
+
+BASE_DIR = Path(__file__).parent
+
+# Defaults for the 'server' section of system_config.json
+SERVER_DEFAULTS = {
+    'host': '0.0.0.0',
+    'port': 5000,
+    'workers': 4,
+    'max_requests': 500,
+    'max_requests_jitter': 50,
+    'backlog': 128
+}
+
+logger = logging.getLogger('prefork_server')
+
+
+class WorkerSlot(ctypes.Structure):
+    """Per-worker status, kept in memory shared between the master and all workers"""
+    _fields_ = [
+        ('pid', ctypes.c_int),
+        ('generation', ctypes.c_int),
+        ('started_at', ctypes.c_double),
+        ('last_request_at', ctypes.c_double),
+        ('requests', ctypes.c_long),
+        ('active', ctypes.c_int),
+        ('max_rss_kb', ctypes.c_long)
+    ]
+
+
+# Scoreboard of the running server; inherited by forked workers
+_scoreboard = None
+_worker_index = None
+
+
+def worker_health() -> List[Dict]:
+    """Status of every worker slot, registered with the app for /api/health"""
+    now = time.time()
+    workers = []
+    for index, slot in enumerate(_scoreboard):
+        workers.append({
+            'worker': index,
+            'pid': slot.pid,
+            'generation': slot.generation,
+            'uptime_seconds': round(now - slot.started_at, 1) if slot.pid else 0,
+            'requests': slot.requests,
+            'busy': bool(slot.active),
+            'last_request_at': slot.last_request_at or None,
+            'max_rss_mb': round(slot.max_rss_kb / 1024, 1),
+            'current': index == _worker_index
+        })
+    return workers
+
+
+class PreforkServer:
+    """
+    Master process managing a fixed number of forked WSGI workers
+    
+    The application (pandas, numpy, config and the compiled mapping engine) is imported
+    once in the master before forking, so workers start instantly and share those pages
+    copy-on-write. Each worker exits after max_requests (plus random jitter, so workers
+    do not all restart together) and is replaced, which bounds heap fragmentation.
+    """
+    
+    def __init__(self, config: Dict):
+        self.config = {**SERVER_DEFAULTS, **config}
+        self.workers = {}
+        self.running = True
+        self.socket = None
+        self.app = None
+    
+    def preload(self):
+        """Import the application and its engines in the master process"""
+        import pandas  # noqa: F401
+        import numpy  # noqa: F401
+        import openpyxl  # noqa: F401
+        from app import app
+        
+        self.app = app
+        self.app.config['WORKER_HEALTH'] = worker_health
+        
+        # Keep the preloaded objects out of future collections so the garbage collector
+        # does not write to (and so copy) the shared pages in every worker
+        gc.collect()
+        gc.freeze()
+        logger.info("Application preloaded")
+    
+    def bind(self):
+        """Open the listening socket shared by all workers"""
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.config['host'], self.config['port']))
+        self.socket.listen(self.config['backlog'])
+        
+        # Idle workers all wait on this socket; non-blocking accept lets the ones that
+        # lose the race go back to waiting instead of blocking (and missing SIGTERM)
+        self.socket.setblocking(False)
+        logger.info(f"Listening on {self.config['host']}:{self.config['port']}")
+    
+    def run(self):
+        """Preload, bind, fork the workers and supervise them until stopped"""
+        global _scoreboard
+        
+        self.preload()
+        self.bind()
+        _scoreboard = RawArray(WorkerSlot, self.config['workers'])
+        
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        
+        for index in range(self.config['workers']):
+            self._spawn(index)
+        
+        while self.running:
+            self._reap()
+            time.sleep(0.5)
+        
+        self._shutdown()
+    
+    def _reap(self):
+        """Replace workers that exited (recycled or crashed)"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            
+            index = self.workers.pop(pid, None)
+            if index is not None and self.running:
+                logger.info(f"Worker {index} (pid {pid}) exited with status {status}, respawning")
+                self._spawn(index)
+    
+    def _spawn(self, index: int):
+        """Fork a worker into a scoreboard slot"""
+        slot = _scoreboard[index]
+        generation = slot.generation + 1
+        
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = index
+            return
+        
+        # Worker process
+        try:
+            self._serve(index, generation)
+            exit_code = 0
+        except Exception as e:
+            logger.error(f"Worker {index} crashed: {e}", exc_info=True)
+            exit_code = 1
+        os._exit(exit_code)
+    
+    def _serve(self, index: int, generation: int):
+        """Worker loop: serve requests until recycled or told to stop"""
+        global _worker_index
+        from werkzeug.serving import make_server
+        
+        _worker_index = index
+        slot = _scoreboard[index]
+        slot.pid = os.getpid()
+        slot.generation = generation
+        slot.started_at = time.time()
+        slot.last_request_at = 0.0
+        slot.requests = 0
+        slot.active = 0
+        
+        alive = [True]
+        signal.signal(signal.SIGTERM, lambda signum, frame: alive.__setitem__(0, False))
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        
+        limit = self.config['max_requests']
+        if limit:
+            limit += random.randint(0, self.config['max_requests_jitter'])
+        
+        server = make_server(
+            self.config['host'], self.config['port'], self._track(slot, self.app), fd=self.socket.fileno()
+        )
+        server.timeout = 1.0
+        
+        while alive[0] and not (limit and slot.requests >= limit):
+            server.handle_request()
+        
+        server.server_close()
+        logger.info(f"Worker {index} (pid {slot.pid}) exiting after {slot.requests} requests")
+    
+    def _track(self, slot: WorkerSlot, app):
+        """WSGI wrapper recording request counts and memory in the worker's slot"""
+        import resource
+        
+        def tracked(environ, start_response):
+            slot.active = 1
+            try:
+                return app(environ, start_response)
+            finally:
+                slot.active = 0
+                slot.requests += 1
+                slot.last_request_at = time.time()
+                slot.max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        
+        return tracked
+    
+    def _stop(self, signum, frame):
+        """Stop supervising; workers are terminated on the way out"""
+        self.running = False
+    
+    def _shutdown(self):
+        """Terminate the workers and wait for them to finish their current request"""
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.workers.clear()
+        self.socket.close()
+        logger.info("Server stopped")
+
+
+def load_server_config() -> Dict:
+    """'server' section of system_config.json"""
+    import json
+    
+    try:
+        with open(BASE_DIR / 'config' / 'system_config.json', 'r') as f:
+            return json.load(f).get('server', {})
+    except Exception as e:
+        logger.warning(f"Could not load server config: {e}")
+        return {}
+
+
+def main():
+    """Run the API with pre-forked workers"""
+    config = load_server_config()
+    parser = argparse.ArgumentParser(description='Serve the MRI Trial Balance API with pre-forked workers')
+    parser.add_argument('--host', default=config.get('host', SERVER_DEFAULTS['host']))
+    parser.add_argument('--port', type=int, default=config.get('port', SERVER_DEFAULTS['port']))
+    parser.add_argument('--workers', type=int, default=config.get('workers', SERVER_DEFAULTS['workers']))
+    parser.add_argument('--max-requests', type=int,
+                        default=config.get('max_requests', SERVER_DEFAULTS['max_requests']),
+                        help='Recycle a worker after this many requests (0 disables recycling)')
+    parser.add_argument('--max-requests-jitter', type=int,
+                        default=config.get('max_requests_jitter', SERVER_DEFAULTS['max_requests_jitter']))
+    args = parser.parse_args()
+    
+    if not hasattr(os, 'fork'):
+        sys.exit('The pre-fork server needs a platform with fork(); use "python app.py" instead')
+    
+    config.update({
+        'host': args.host,
+        'port': args.port,
+        'workers': max(1, args.workers),
+        'max_requests': max(0, args.max_requests),
+        'max_requests_jitter': max(0, args.max_requests_jitter)
+    })
+    PreforkServer(config).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -10,12 +10,32 @@ from datetime import datetime
 import logging
 from pathlib import Path
 
+from src.core.stage_graph import StageGraph
+
+
+MRI_IMPORT_COLUMNS = [
+    'PERIOD', 'REF', 'SOURCE', 'ENTITYID', 'ACCTNUM', 'DEPARTMENT',
+    'AMT', 'DESCRPN', 'ENTRDATE', 'STATUS', 'BASIS', 'AUDITFLAG',
+    'ADDLDESC', 'ASSETCLASS', 'ASSETCODE', 'INTERENTITY'
+]
+
 
 class SimpleTrialBalanceProcessor:
     """Simple processor that works with actual trial balance files"""
     
-    def __init__(self):
+    def __init__(self, entity_overlay=None, export_chunk_rows=10000, processing_rules=None):
+        """
+        Args:
+            entity_overlay: Per-entity account -> MRI account overrides, consulted before
+                the shared mappings below
+            export_chunk_rows: Records per block when writing the MRI import CSV
+                (file_settings.export_chunk_rows)
+            processing_rules: processing_rules section of system_config.json
+                (zero_activity_exclude, materiality_threshold, rounding_precision)
+        """
         self.logger = logging.getLogger(__name__)
+        self.export_chunk_rows = export_chunk_rows
+        self.processing_rules = processing_rules or {}
         self.prior_tb = None
         self.current_tb = None
         self.activity_data = None
@@ -54,6 +74,7 @@ class SimpleTrialBalanceProcessor:
             # Special cases
             "Calculated Prior Years Retained Earnings": "GM79000"
         }
+        self.entity_overlay = entity_overlay or {}
         
     def load_trial_balances(self, prior_path, current_path):
         """Load Excel trial balance files"""
@@ -63,6 +84,9 @@ class SimpleTrialBalanceProcessor:
             
             if self.prior_tb is None or self.current_tb is None:
                 return False
+            
+            self.prior_tb = self._drop_zero_balances(self.prior_tb)
+            self.current_tb = self._drop_zero_balances(self.current_tb)
                 
             self.logger.info(f"Loaded Prior: {len(self.prior_tb)} accounts, Current: {len(self.current_tb)} accounts")
             return True
@@ -71,6 +95,44 @@ class SimpleTrialBalanceProcessor:
             self.logger.error(f"Error loading trial balances: {e}")
             return False
     
+    def _drop_zero_balances(self, df):
+        """
+        Drop zero-balance rows before activity and mapping (processing_rules.zero_activity_exclude)
+        
+        A zero row behaves like a missing row once prior and current are outer-merged with
+        zero fill, so accounts zero in both periods vanish and activity is unchanged.
+        """
+        if not self.processing_rules.get('zero_activity_exclude', False):
+            return df
+        
+        precision = self.processing_rules.get('rounding_precision', 2)
+        return df[df['Net'].round(precision) != 0]
+    
+    def load_trial_balance_file(self, file_path):
+        """Load a single trial balance file as the prior period (structure validation)"""
+        self.prior_tb = self._load_excel_tb(file_path, "Validation")
+        return self.prior_tb is not None
+    
+    def build_stage_graph(self, prior_path, current_path=None, period='04/25', entity_id='M55020', output_path=None):
+        """
+        Describe processing as lazily evaluated stages
+        
+        Uses the same stage names as the full processor. Loading already cleans and the
+        activity calculation already maps, so 'clean' and 'map' complete with them.
+        """
+        graph = StageGraph()
+        if current_path is None:
+            graph.add_stage('load', lambda: self.load_trial_balance_file(prior_path))
+        else:
+            graph.add_stage('load', lambda: self.load_trial_balances(prior_path, current_path))
+        graph.add_stage('clean', lambda: True, ['load'])
+        graph.add_stage('activity', self.calculate_activity_with_mapping, ['clean'])
+        graph.add_stage('map', lambda: True, ['activity'])
+        graph.add_stage('generate', lambda: self.generate_mri_import_file(period, entity_id), ['map'])
+        graph.add_stage('validate', self.run_comprehensive_validation, ['map'])
+        graph.add_stage('export', lambda: self.export_mri_import_file(output_path, period, entity_id), ['generate'])
+        return graph
+    
     def _load_excel_tb(self, file_path, period_name):
         """Load Excel trial balance file"""
         try:
@@ -271,7 +333,9 @@ class SimpleTrialBalanceProcessor:
                 on='Account',
                 how='outer',
                 suffixes=('_prior', '_current')
-            ).fillna(0)
+            )
+            # Only balances are zero-filled, so accounts missing from one period keep their description
+            merged[['Prior_Net', 'Current_Net']] = merged[['Prior_Net', 'Current_Net']].fillna(0)
             
             self.logger.info(f"Merged data shape: {merged.shape}")
             
@@ -284,7 +348,7 @@ class SimpleTrialBalanceProcessor:
                     desc_current = desc_current.iloc[:, 0] if len(desc_current.shape) > 1 else desc_current
                 if hasattr(desc_prior, 'iloc'):
                     desc_prior = desc_prior.iloc[:, 0] if len(desc_prior.shape) > 1 else desc_prior
-                merged['Description'] = desc_current.fillna(desc_prior)
+                merged['Description'] = desc_current.fillna(desc_prior).fillna('')
                 merged = merged.drop(['Description_prior', 'Description_current'], axis=1)
             elif 'Description_current' in merged.columns:
                 merged['Description'] = merged['Description_current']
@@ -300,18 +364,21 @@ class SimpleTrialBalanceProcessor:
             
             self.logger.info(f"Activity calculated. Non-zero activities: {len(merged[merged['Activity'] != 0])}")
             
+            # Apply materiality threshold before mapping so only surviving accounts are mapped
+            before_filter = len(merged)
+            threshold = self.processing_rules.get('materiality_threshold', 0.01)
+            merged = merged[np.abs(merged['Activity']) >= threshold].copy()
+            
             # Apply mappings
             merged['MRI_Account'] = merged['Account'].map(self.account_mappings)
+            if self.entity_overlay:
+                merged['MRI_Account'] = merged['Account'].map(self.entity_overlay).fillna(merged['MRI_Account'])
             
             self.logger.info(f"Mapped accounts: {len(merged[merged['MRI_Account'].notna()])}")
             self.logger.info(f"Unmapped accounts: {merged[merged['MRI_Account'].isna()]['Account'].tolist()}")
             
-            # Filter for material activity and mapped accounts
-            before_filter = len(merged)
-            merged = merged[
-                (np.abs(merged['Activity']) >= 0.01) & 
-                (merged['MRI_Account'].notna())
-            ]
+            # Keep mapped accounts
+            merged = merged[merged['MRI_Account'].notna()]
             
             self.logger.info(f"After filtering: {len(merged)} accounts (was {before_filter})")
             
@@ -354,6 +421,51 @@ class SimpleTrialBalanceProcessor:
         }
         return True
     
+    def _build_import_frame(self, activity, period, entity_id):
+        """Build the MRI import records for a block of activity data"""
+        import_records = []
+        for _, row in activity.iterrows():
+            record = {
+                'PERIOD': period,
+                'REF': '',
+                'SOURCE': 'GA',
+                'ENTITYID': entity_id,
+                'ACCTNUM': row['MRI_Account'],
+                'DEPARTMENT': '@',
+                'AMT': round(float(row['Activity']), 2),
+                'DESCRPN': str(row['Description']),
+                'ENTRDATE': f"{datetime.now().strftime('%Y-%m-%d')} 00:00:00",
+                'STATUS': 'P',
+                'BASIS': 'B',
+                'AUDITFLAG': '',
+                'ADDLDESC': '',
+                'ASSETCLASS': '',
+                'ASSETCODE': '',
+                'INTERENTITY': ''
+            }
+            import_records.append(record)
+            self.logger.info(f"Added record: {row['Account']} -> {row['MRI_Account']}, Amount: {row['Activity']}")
+        
+        return pd.DataFrame(import_records, columns=MRI_IMPORT_COLUMNS)
+    
+    def iter_mri_import_csv(self, period='04/25', entity_id='M55020', chunk_rows=None):
+        """
+        Yield the MRI import CSV in bounded chunks, header first
+        
+        Records are built one block of chunk_rows activity rows at a time (default
+        export_chunk_rows), so the full import frame never exists in memory.
+        """
+        chunk_rows = chunk_rows or self.export_chunk_rows
+        yield ','.join(MRI_IMPORT_COLUMNS) + '\n'
+        
+        if self.activity_data is None or len(self.activity_data) == 0:
+            self.logger.warning("No activity data found - MRI import has headers only")
+            return
+        
+        for start in range(0, len(self.activity_data), chunk_rows):
+            block = self._build_import_frame(self.activity_data.iloc[start:start + chunk_rows], period, entity_id)
+            yield block.to_csv(index=False, header=False)
+    
     def export_mri_import_file(self, output_path, period='04/25', entity_id='M55020'):
         """Export MRI import CSV"""
         try:
@@ -361,43 +473,13 @@ class SimpleTrialBalanceProcessor:
             if self.activity_data is not None:
                 self.logger.info(f"Activity data length: {len(self.activity_data)}")
             
-            if self.activity_data is None or len(self.activity_data) == 0:
-                self.logger.warning("No activity data found - creating empty file with headers only")
-                # Create empty file with headers
-                with open(output_path, 'w') as f:
-                    f.write("PERIOD,REF,SOURCE,ENTITYID,ACCTNUM,DEPARTMENT,AMT,DESCRPN,ENTRDATE,STATUS,BASIS,AUDITFLAG,ADDLDESC,ASSETCLASS,ASSETCODE,INTERENTITY\n")
-                self.logger.info("Created empty MRI import file")
-                return True
-            
-            # Generate actual MRI format
-            import_records = []
-            for _, row in self.activity_data.iterrows():
-                record = {
-                    'PERIOD': period,
-                    'REF': '',
-                    'SOURCE': 'GA',
-                    'ENTITYID': entity_id,
-                    'ACCTNUM': row['MRI_Account'],
-                    'DEPARTMENT': '@',
-                    'AMT': round(float(row['Activity']), 2),
-                    'DESCRPN': str(row['Description']),
-                    'ENTRDATE': f"{datetime.now().strftime('%Y-%m-%d')} 00:00:00",
-                    'STATUS': 'P',
-                    'BASIS': 'B',
-                    'AUDITFLAG': '',
-                    'ADDLDESC': '',
-                    'ASSETCLASS': '',
-                    'ASSETCODE': '',
-                    'INTERENTITY': ''
-                }
-                import_records.append(record)
-                self.logger.info(f"Added record: {row['Account']} -> {row['MRI_Account']}, Amount: {row['Activity']}")
-            
-            # Write to CSV
-            import_df = pd.DataFrame(import_records)
-            import_df.to_csv(output_path, index=False)
+            # Write to CSV one chunk at a time
+            with open(output_path, 'w', newline='') as f:
+                for chunk in self.iter_mri_import_csv(period, entity_id):
+                    f.write(chunk)
             
-            self.logger.info(f"Successfully exported {len(import_records)} records to {output_path}")
+            records = len(self.activity_data) if self.activity_data is not None else 0
+            self.logger.info(f"Successfully exported {records} records to {output_path}")
             return True
             
         except Exception as e:
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Admission Control
+Memory and concurrency budget for processing runs, shared by all threads and pre-forked workers
+"""
+
+import os
+import time
+import ctypes
+import logging
+import multiprocessing
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+
+# Peak memory of a run per byte of input, by file format (Excel expands far more than CSV)
+DEFAULT_FORMAT_MULTIPLIERS = {'.csv': 8, '.xlsx': 40, '.xls': 20}
+
+# Slots of the shared state array
+RESERVED, RUNNING, QUEUED, REJECTED = range(4)
+
+
+class AdmissionRejected(Exception):
+    """A run could not be admitted; retry_after is the suggested wait in seconds"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admits processing runs while their estimated memory fits a global budget
+    
+    Each run reserves an estimate of its peak memory (input size times a per-format
+    multiplier, plus a fixed base). Runs that do not fit wait in a bounded queue for up
+    to queue_timeout seconds; beyond that, or with a full queue, they are rejected so the
+    caller can answer 429 with Retry-After instead of pushing the host into swap.
+    
+    Counters live in shared memory behind a multiprocessing condition, so a controller
+    created before the pre-fork server forks enforces one budget across all workers.
+    """
+    
+    def __init__(self, config: Dict):
+        """
+        Args:
+            config: admission_control section of system_config.json
+        """
+        self.logger = logging.getLogger(__name__)
+        self.enabled = config.get('enabled', True)
+        self.memory_budget = int((config.get('memory_budget_mb') or self._default_budget_mb()) * 1024 * 1024)
+        self.max_concurrent = config.get('max_concurrent_runs', 4)
+        self.max_queued = config.get('max_queued', 16)
+        self.queue_timeout = config.get('queue_timeout_seconds', 30)
+        self.retry_after = config.get('retry_after_seconds', 15)
+        self.base_cost = int(config.get('base_cost_mb', 64) * 1024 * 1024)
+        self.format_multipliers = {**DEFAULT_FORMAT_MULTIPLIERS, **config.get('format_multipliers', {})}
+        
+        self._condition = multiprocessing.Condition()
+        self._state = multiprocessing.RawArray(ctypes.c_longlong, 4)
+    
+    def _default_budget_mb(self) -> float:
+        """Half of physical memory, or 2GB where it cannot be determined"""
+        try:
+            return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (2 * 1024 * 1024)
+        except (AttributeError, ValueError, OSError):
+            return 2048
+    
+    def estimate(self, paths: List[Path]) -> int:
+        """Estimated peak memory of a run over the given input files, in bytes"""
+        cost = self.base_cost
+        for path in paths:
+            path = Path(path)
+            multiplier = self.format_multipliers.get(path.suffix.lower(), max(self.format_multipliers.values()))
+            cost += path.stat().st_size * multiplier
+        return int(cost)
+    
+    def _fits(self, cost: int) -> bool:
+        """Whether a run of this cost can start now (caller holds the condition)"""
+        return self._state[RUNNING] < self.max_concurrent and self._state[RESERVED] + cost <= self.memory_budget
+    
+    def acquire(self, cost: int) -> int:
+        """
+        Reserve budget for a run, waiting in the queue if necessary
+        
+        A run larger than the whole budget is admitted once nothing else is running.
+        
+        Returns:
+            The reservation to pass to release()
+        
+        Raises:
+            AdmissionRejected: queue full or no capacity within queue_timeout
+        """
+        if not self.enabled:
+            return 0
+        
+        cost = max(1, min(int(cost), self.memory_budget))
+        deadline = time.monotonic() + self.queue_timeout
+        
+        with self._condition:
+            if not self._fits(cost):
+                if self._state[QUEUED] >= self.max_queued:
+                    self._state[REJECTED] += 1
+                    raise AdmissionRejected('Server busy: processing queue is full', self.retry_after)
+                
+                self._state[QUEUED] += 1
+                try:
+                    while not self._fits(cost):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._state[REJECTED] += 1
+                            raise AdmissionRejected('Server busy: no processing capacity available', self.retry_after)
+                        self._condition.wait(remaining)
+                finally:
+                    self._state[QUEUED] -= 1
+            
+            self._state[RESERVED] += cost
+            self._state[RUNNING] += 1
+        
+        self.logger.info(f"Admitted run reserving {cost / (1024 * 1024):.0f}MB")
+        return cost
+    
+    def release(self, reservation: int):
+        """Return a run's reservation to the budget and wake queued runs"""
+        if not self.enabled:
+            return
+        
+        with self._condition:
+            self._state[RESERVED] -= reservation
+            self._state[RUNNING] -= 1
+            self._condition.notify_all()
+    
+    def release_after(self, chunks: Iterator, reservation: int) -> Iterator:
+        """Wrap a streamed response so the reservation is released once it is sent or closed"""
+        return _ReleasingIterator(self, chunks, reservation)
+    
+    def usage(self) -> Dict:
+        """Current budget usage, for /api/health"""
+        return {
+            'enabled': self.enabled,
+            'running': self._state[RUNNING],
+            'queued': self._state[QUEUED],
+            'rejected': self._state[REJECTED],
+            'max_concurrent_runs': self.max_concurrent,
+            'reserved_mb': round(self._state[RESERVED] / (1024 * 1024), 1),
+            'memory_budget_mb': round(self.memory_budget / (1024 * 1024), 1)
+        }
+
+
+class _ReleasingIterator:
+    """Iterator that releases an admission reservation when exhausted or closed"""
+    
+    def __init__(self, controller: AdmissionController, chunks: Iterator, reservation: int):
+        self.controller = controller
+        self.chunks = chunks
+        self.reservation = reservation
+        self.released = False
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        try:
+            return next(self.chunks)
+        except BaseException:
+            self.close()
+            raise
+    
+    def close(self):
+        if not self.released:
+            self.released = True
+            self.controller.release(self.reservation)
+            if hasattr(self.chunks, 'close'):
+                self.chunks.close()
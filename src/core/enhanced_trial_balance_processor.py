@@ -6,7 +6,10 @@ Main processing engine replicating Excel Trial Balance Conversion Tool
 
 import pandas as pd
 import numpy as np
+import re
 import json
+import shutil
+import hashlib
 import logging
 from datetime import datetime
 from pathlib import Path
@@ -14,7 +17,27 @@ from typing import Dict, Optional, List, Tuple
 
 from ..engines.account_mapping_engine import AccountMappingEngine
 from ..engines.mri_import_generator import MRIImportGenerator
+from ..engines.excel_report_writer import ExcelReportWriter
 from ..validators.validation_engine import ValidationEngine
+from .stage_store import StageStore
+from .stage_graph import StageGraph
+
+
+# Processor attributes exchanged between stages, with their interchange schema
+STAGE_ATTRIBUTES = {
+    'prior_tb': 'trial_balance',
+    'current_tb': 'trial_balance',
+    'activity_data': 'activity',
+    'mri_import_data': 'mri_import'
+}
+
+# Checkpointed pipeline stages in execution order, with the attributes each one produces
+CHECKPOINT_STAGES = [
+    ('cleaned', ['prior_tb', 'current_tb']),
+    ('activity', ['activity_data']),
+    ('import', ['mri_import_data']),
+    ('validation', ['validation_results'])
+]
 
 
 class EnhancedTrialBalanceProcessor:
@@ -23,7 +46,14 @@ class EnhancedTrialBalanceProcessor:
     Includes account mapping, MRI import generation, and comprehensive validation
     """
     
-    def __init__(self, config_dir: Path):
+    def __init__(self, config_dir: Path, mapping_set: Optional[str] = None, effective_period: Optional[str] = None):
+        """
+        Args:
+            config_dir: Project directory holding config/ and data/mappings/
+            mapping_set: Mapping set to load from the mapping store instead of gl_mapping.json
+            effective_period: Period the mapping version must be effective for (defaults to
+                the period of each run, or today until a run sets one)
+        """
         self.logger = self._setup_logging()
         self.config_dir = Path(config_dir)
         
@@ -31,9 +61,16 @@ class EnhancedTrialBalanceProcessor:
         self.system_config = self._load_system_config()
         
         # Initialize engines
-        self.mapping_engine = AccountMappingEngine(config_dir / 'data' / 'mappings')
+        self.mapping_set = mapping_set
+        self.effective_period = effective_period
+        self._load_mapping_engine(effective_period or datetime.now().strftime('%Y-%m'))
         self.import_generator = MRIImportGenerator(self.system_config)
         self.validation_engine = ValidationEngine(self.system_config)
+        self.excel_writer = ExcelReportWriter(self.system_config)
+        self.stage_store = StageStore()
+        
+        # Entity whose mapping overlay (gl_mapping.json 'entity_overlays') applies
+        self.entity_id = None
         
         # Data storage
         self.prior_tb = None
@@ -41,6 +78,10 @@ class EnhancedTrialBalanceProcessor:
         self.activity_data = None
         self.mri_import_data = None
         self.validation_results = None
+        self.period_snapshots = None
+        self.opening_balance = None
+        self.period_activity = None
+        self.checkpoint_info = None
         
     def _setup_logging(self):
         """Configure logging"""
@@ -63,25 +104,339 @@ class EnhancedTrialBalanceProcessor:
             self.logger.error(f"Error loading system config: {e}")
             return {}
     
-    def load_trial_balances(self, prior_path: Path, current_path: Path) -> bool:
-        """Load and parse trial balance files (CSV or Excel)"""
+    def _uses_mapping_store(self) -> bool:
+        """The store is used when a mapping set is requested or mapping_store.enabled is set"""
+        return self.mapping_set is not None or self.system_config.get('mapping_store', {}).get('enabled', False)
+    
+    def _load_mapping_engine(self, effective_period: str):
+        """Build the mapping engine from the store version in effect for a period (or gl_mapping.json)"""
+        self.mapping_engine = AccountMappingEngine(
+            self.config_dir / 'data' / 'mappings',
+            self._load_store_mapping(self.mapping_set, effective_period)
+        )
+        self.mapping_period = effective_period
+    
+    def _use_run_period_mapping(self, period: Optional[str]):
+        """
+        Switch to the store version in effect for the run's period (MM/YY)
+        
+        A catch-up run for an earlier period must map with that period's version, not
+        today's. Skipped when the store is not used or the constructor fixed a period.
+        """
+        if not period or self.effective_period is not None or not self._uses_mapping_store():
+            return
+        
+        from ..engines.mapping_store import normalize_period
+        
         try:
+            run_period = normalize_period(period)
+        except ValueError as e:
+            self.logger.warning(f"Keeping mapping version for {self.mapping_period}: {e}")
+            return
+        
+        if run_period != self.mapping_period:
+            self._load_mapping_engine(run_period)
+    
+    def _load_store_mapping(self, mapping_set: Optional[str], effective_period: str) -> Optional[Dict]:
+        """Mapping version from the mapping store, or None to use gl_mapping.json"""
+        if not self._uses_mapping_store():
+            return None
+        
+        store_config = self.system_config.get('mapping_store', {})
+        try:
+            from ..engines.mapping_store import MappingStore
+            
+            mapping_set = mapping_set or store_config.get('mapping_set', 'default')
+            database = self.config_dir / store_config.get('database', 'data/mappings/mapping_store.db')
+            
+            mapping = MappingStore(f"sqlite:///{database}").load_mapping(mapping_set, effective_period)
+            if mapping is None:
+                self.logger.warning(f"No {mapping_set} mapping effective for {effective_period}, using gl_mapping.json")
+            else:
+                self.logger.info(f"Loaded {len(mapping['account_mappings'])} mappings from {mapping_set} "
+                                 f"effective {mapping['mapping_info']['effective_period']}")
+            return mapping
+            
+        except Exception as e:
+            self.logger.error(f"Error loading mapping set {mapping_set}: {e}")
+            return None
+    
+    def load_trial_balances(self, prior_path: Path, current_path: Path, input_mode: str = 'trial_balance') -> bool:
+        """
+        Load and parse trial balance files (CSV or Excel)
+        
+        Args:
+            prior_path: Prior period file
+            current_path: Current period file
+            input_mode: 'trial_balance' for TB exports, 'gl_detail' for transaction-level
+                GL detail that is rolled up to a trial balance while it is read
+        """
+        if not self.read_trial_balances(prior_path, current_path, input_mode):
+            return False
+        
+        if not self.clean_trial_balances():
+            return False
+        
+        self.logger.info(f"Trial balances loaded - Prior: {len(self.prior_tb)} accounts, Current: {len(self.current_tb)} accounts")
+        return True
+    
+    def read_trial_balances(self, prior_path: Path, current_path: Optional[Path] = None,
+                            input_mode: str = 'trial_balance') -> bool:
+        """
+        Read trial balance files without cleaning them
+        
+        current_path may be omitted to read a single file (e.g. structure validation).
+        """
+        try:
+            if input_mode == 'gl_detail':
+                loader = self._load_gl_detail_file
+            elif input_mode == 'trial_balance':
+                loader = self._load_trial_balance_file
+            else:
+                raise ValueError(f"Unsupported input mode: {input_mode}")
+            
             # Load files
-            self.prior_tb = self._load_trial_balance_file(prior_path, "Prior")
-            self.current_tb = self._load_trial_balance_file(current_path, "Current")
+            self.prior_tb = loader(prior_path, "Prior")
+            self.current_tb = loader(current_path, "Current") if current_path is not None else None
             
-            if self.prior_tb is None or self.current_tb is None:
-                return False
+            return self.prior_tb is not None and (current_path is None or self.current_tb is not None)
+            
+        except Exception as e:
+            self.logger.error(f"Error loading trial balances: {e}")
+            return False
+    
+    def clean_trial_balances(self) -> bool:
+        """Clean and standardize whichever trial balances have been read"""
+        try:
+            if self.prior_tb is None:
+                raise ValueError("Trial balance data not loaded")
             
-            # Clean and standardize data
             self.prior_tb = self._clean_trial_balance_data(self.prior_tb)
-            self.current_tb = self._clean_trial_balance_data(self.current_tb)
+            if self.current_tb is not None:
+                self.current_tb = self._clean_trial_balance_data(self.current_tb)
             
-            self.logger.info(f"Trial balances loaded - Prior: {len(self.prior_tb)} accounts, Current: {len(self.current_tb)} accounts")
             return True
             
         except Exception as e:
-            self.logger.error(f"Error loading trial balances: {e}")
+            self.logger.error(f"Error cleaning trial balances: {e}")
+            return False
+    
+    def load_wide_trial_balance(self, file_path: Path, year: Optional[int] = None,
+                                opening_balance: Optional[Path] = None) -> bool:
+        """
+        Load a wide-format workbook with one balance column per month
+        
+        The file is read once, every period column ("Jan Balance", "Feb 2025", ...) is
+        detected from the header, and a single melt reshapes them into one cleaned
+        trial balance snapshot per period, stored in period_snapshots (MM/YY, oldest first).
+        
+        Args:
+            file_path: CSV or Excel file with period balance columns
+            year: Year of the first period column, for headers that carry no year; later
+                month-only columns roll into the next year where the month goes down
+                (Jul ... Dec, Jan ... Jun). Not needed when a header carries its year.
+            opening_balance: Trial balance for the month before the first column; without
+                it the first column is only used as the opening balance and gets no import
+        """
+        try:
+            file_path = Path(file_path)
+            wide_config = self.system_config.get('wide_format', {})
+            
+            df = self._read_wide_trial_balance(file_path, wide_config)
+            if df is None:
+                raise ValueError(f"No period balance columns found in {file_path.name}")
+            
+            period_columns = self._detect_period_columns(df.columns, wide_config, year)
+            
+            labels = list(period_columns.values())
+            duplicates = sorted({label for label in labels if labels.count(label) > 1})
+            if duplicates:
+                columns = [str(col) for col, label in period_columns.items() if label in duplicates]
+                raise ValueError(f"Several columns hold the same period {duplicates}: {columns}")
+            
+            if len(period_columns) < (1 if opening_balance else 2):
+                raise ValueError("Wide-format trial balance needs at least two period columns, "
+                                 "or one with an opening balance")
+            
+            self.opening_balance = None
+            if opening_balance:
+                opening = self._load_trial_balance_file(opening_balance, "Opening")
+                if opening is None:
+                    raise ValueError(f"Could not load opening balance {opening_balance}")
+                self.opening_balance = self._clean_trial_balance_data(opening)
+            
+            id_columns = [col for col in ['Entity', 'Account', 'Description', 'Department'] if col in df.columns]
+            long_df = df.melt(
+                id_vars=id_columns,
+                value_vars=list(period_columns),
+                var_name='Period',
+                value_name='Net'
+            )
+            long_df['Period'] = long_df['Period'].map(period_columns)
+            long_df['Net'] = self._parse_amounts(long_df['Net'])
+            long_df = self._apply_ingestion_predicates(long_df)
+            
+            # Periods in chronological order, as returned by _detect_period_columns
+            ordered = list(period_columns.values())
+            
+            snapshots = {
+                label: snapshot.drop(columns='Period')
+                for label, snapshot in long_df.groupby('Period', sort=False)
+            }
+            empty = long_df.iloc[0:0].drop(columns='Period')
+            self.period_snapshots = {
+                label: self._clean_trial_balance_data(snapshots.get(label, empty))
+                for label in ordered
+            }
+            
+            self.logger.info(f"Wide trial balance loaded - {len(ordered)} periods ({ordered[0]} to {ordered[-1]}), {len(df)} accounts")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error loading wide trial balance {file_path}: {e}")
+            return False
+    
+    def _read_wide_trial_balance(self, file_path: Path, wide_config: Dict) -> Optional[pd.DataFrame]:
+        """Read a wide-format file in a single pass and locate its header row in memory"""
+        if file_path.suffix.lower() == '.csv':
+            # Key columns as text so codes keep their leading zeros; balances are parsed after the melt
+            header = pd.read_csv(file_path, nrows=0).columns
+            key_columns = self._key_columns()
+            text_columns = [col for col in header if col in key_columns]
+            df = pd.read_csv(file_path, dtype={col: str for col in text_columns})
+            return self._standardize_excel_columns(df)
+        
+        if file_path.suffix.lower() not in ['.xlsx', '.xls']:
+            raise ValueError(f"Unsupported file format: {file_path.suffix}")
+        
+        sheets = pd.read_excel(file_path, sheet_name=None, header=None)
+        for sheet_name, raw in sheets.items():
+            for i, row in raw.iterrows():
+                headers = [str(cell).strip() for cell in row if pd.notna(cell)]
+                has_account = any('Account' in header for header in headers)
+                if has_account and len(self._match_period_columns(headers, wide_config)) >= 2:
+                    df = raw.iloc[i + 1:].copy()
+                    df.columns = [str(cell).strip() if pd.notna(cell) else f"Unnamed_{j}" for j, cell in enumerate(row)]
+                    df = df.dropna(how='all')
+                    return self._standardize_excel_columns(df)
+        
+        return None
+    
+    def _match_period_columns(self, columns, wide_config: Dict) -> List[Tuple]:
+        """(column, month, year or None) for every period balance header, in column order"""
+        months = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+        pattern = wide_config.get(
+            'period_column_pattern',
+            r'^(?P<month>jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t|tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?[\s\-]*(?P<year>\d{2}|\d{4})?\s*(balance)?$'
+        )
+        
+        matches = []
+        for col in columns:
+            match = re.match(pattern, str(col).strip(), re.IGNORECASE)
+            if not match:
+                continue
+            
+            month = months.index(match.group('month')[:3].lower()) + 1
+            column_year = match.groupdict().get('year')
+            if column_year:
+                column_year = int(column_year) + (2000 if len(column_year) == 2 else 0)
+            matches.append((col, month, column_year))
+        
+        return matches
+    
+    def _detect_period_columns(self, columns, wide_config: Dict, year: Optional[int] = None) -> Dict:
+        """
+        Map period balance column headers to MM/YY period labels, oldest period first
+        
+        Headers without a year take theirs from column position: the first period column
+        is in `year` (or is counted back from the first header that carries one) and the
+        year advances wherever the month goes down, so a Jul ... Jun fiscal year spans two
+        calendar years.
+        """
+        matches = self._match_period_columns(columns, wide_config)
+        if not matches:
+            return {}
+        
+        # Year changes between consecutive columns, before any explicit year resets it
+        rollovers = [0]
+        for (_, previous, _), (_, month, _) in zip(matches, matches[1:]):
+            rollovers.append(rollovers[-1] + (month < previous))
+        
+        if year is None:
+            anchor = next(((i, column_year) for i, (_, _, column_year) in enumerate(matches) if column_year), None)
+            if anchor is None:
+                raise ValueError("Period columns carry no year; pass the year of the first period column")
+            year = anchor[1] - rollovers[anchor[0]]
+        
+        periods = []
+        current_year = int(year)
+        for i, (col, month, column_year) in enumerate(matches):
+            if column_year:
+                current_year = column_year
+            elif i and month < matches[i - 1][1]:
+                current_year += 1
+            periods.append((current_year, month, col))
+        
+        return {col: f"{month:02d}/{str(period_year)[-2:]}" for period_year, month, col in sorted(periods, key=lambda p: p[:2])}
+    
+    def _parse_amounts(self, values: pd.Series) -> pd.Series:
+        """Parse formatted amounts (commas, currency signs, parenthesized negatives) in one pass"""
+        if pd.api.types.is_numeric_dtype(values):
+            return values.fillna(0)
+        
+        cleaned = (
+            values.astype(str)
+            .str.replace(r'[,$\s]', '', regex=True)
+            .str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+        )
+        return pd.to_numeric(cleaned, errors='coerce').fillna(0)
+    
+    def generate_period_imports(self, entity_id: Optional[str] = None) -> bool:
+        """
+        Generate MRI import records for every wide-format period
+        
+        Each period's activity is its snapshot minus the previous one; the first period
+        is measured against the opening balance when one was loaded, and otherwise only
+        serves as the opening balance itself. The records of all periods are combined
+        into mri_import_data, each row carrying its own PERIOD. The activity of all
+        periods is kept in period_activity, while prior_tb, current_tb and activity_data
+        are left on the latest pair for validation.
+        """
+        try:
+            if not self.period_snapshots:
+                raise ValueError("Wide trial balance not loaded")
+            
+            self.entity_id = entity_id
+            periods = list(self.period_snapshots)
+            snapshots = [self.period_snapshots[period] for period in periods]
+            if self.opening_balance is not None:
+                pairs = zip([self.opening_balance] + snapshots, snapshots, periods)
+            else:
+                pairs = zip(snapshots, snapshots[1:], periods[1:])
+            
+            period_imports = []
+            activity_frames = []
+            
+            for prior_tb, current_tb, period in pairs:
+                self.prior_tb = prior_tb
+                self.current_tb = current_tb
+                
+                if not self.calculate_activity_with_mapping():
+                    raise ValueError(f"Activity calculation failed for period {period}")
+                
+                activity_frames.append(self.activity_data.assign(Period=period))
+                period_imports.append(
+                    self.import_generator.generate_import_records(self.activity_data, period, entity_id)
+                )
+            
+            self.period_activity = pd.concat(activity_frames, ignore_index=True)
+            self.mri_import_data = pd.concat(period_imports, ignore_index=True)
+            
+            self.logger.info(f"MRI import generated for {len(period_imports)} periods with {len(self.mri_import_data)} records")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error generating period imports: {e}")
             return False
     
     def _load_trial_balance_file(self, file_path: Path, period_name: str) -> Optional[pd.DataFrame]:
@@ -90,10 +445,12 @@ class EnhancedTrialBalanceProcessor:
             file_path = Path(file_path)
             
             if file_path.suffix.lower() == '.csv':
-                df = pd.read_csv(file_path)
+                df = self._read_csv_trial_balance(file_path)
             elif file_path.suffix.lower() in ['.xlsx', '.xls']:
                 # Try to detect trial balance data in Excel file
                 df = self._parse_excel_trial_balance(file_path)
+                if df is not None:
+                    df = self._apply_ingestion_predicates(df)
             else:
                 raise ValueError(f"Unsupported file format: {file_path.suffix}")
             
@@ -106,6 +463,210 @@ class EnhancedTrialBalanceProcessor:
             self.logger.error(f"Error loading {period_name} trial balance file {file_path}: {e}")
             return None
     
+    def _load_gl_detail_file(self, file_path: Path, period_name: str) -> Optional[pd.DataFrame]:
+        """
+        Load transaction-level GL detail (CSV or Excel) and roll it up to a trial balance
+        
+        Journal lines are read in chunks and folded into a running group-by of debits
+        and credits per account (and per department when the export has one), so memory
+        is bounded by the number of distinct accounts rather than the number of lines.
+        
+        Returns:
+            DataFrame with Account, Description, Debit, Credit, Net (and Entity/Department)
+        """
+        try:
+            file_path = Path(file_path)
+            gl_config = self.system_config.get('gl_detail', {})
+            chunk_size = gl_config.get('chunk_size', 100000)
+            
+            if file_path.suffix.lower() == '.csv':
+                # Key columns stay text so codes keep leading zeros and never become floats
+                header = pd.read_csv(file_path, nrows=0).columns
+                key_columns = self._resolve_gl_detail_columns(header, gl_config.get('columns', {}))
+                dtype = {key_columns[role]: str for role in ['account', 'entity', 'department'] if role in key_columns}
+                chunks = pd.read_csv(file_path, chunksize=chunk_size, dtype=dtype)
+            elif file_path.suffix.lower() in ['.xlsx', '.xlsm']:
+                chunks = self._iter_excel_chunks(file_path, chunk_size)
+            else:
+                raise ValueError(f"Unsupported GL detail format: {file_path.suffix}")
+            
+            totals = None
+            columns = None
+            lines_read = 0
+            
+            for chunk in chunks:
+                if columns is None:
+                    columns = self._resolve_gl_detail_columns(chunk.columns, gl_config.get('columns', {}))
+                
+                lines_read += len(chunk)
+                partial = self._rollup_gl_chunk(chunk, columns)
+                totals = partial if totals is None else self._combine_rollups(totals, partial)
+            
+            if totals is None or totals.empty:
+                raise ValueError(f"No journal lines found in {period_name} GL detail file")
+            
+            tb_df = totals.reset_index()
+            tb_df['Net'] = tb_df['Debit'] - tb_df['Credit']
+            
+            self.logger.info(f"Rolled up {lines_read} {period_name} GL detail lines into {len(tb_df)} balances")
+            return self._apply_ingestion_predicates(tb_df)
+            
+        except Exception as e:
+            self.logger.error(f"Error loading {period_name} GL detail file {file_path}: {e}")
+            return None
+    
+    def _iter_excel_chunks(self, file_path: Path, chunk_size: int):
+        """Yield DataFrames of at most chunk_size rows from the first worksheet, read row by row"""
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            
+            header = None
+            for row in rows:
+                if any(cell is not None for cell in row):
+                    header = [str(cell).strip() if cell is not None else f"Unnamed_{i}" for i, cell in enumerate(row)]
+                    break
+            
+            if header is None:
+                return
+            
+            buffer = []
+            for row in rows:
+                buffer.append(row)
+                if len(buffer) >= chunk_size:
+                    yield pd.DataFrame(buffer, columns=header, dtype=object)
+                    buffer = []
+            
+            # object dtype keeps integer codes from turning into floats around blank cells
+            if buffer:
+                yield pd.DataFrame(buffer, columns=header, dtype=object)
+        finally:
+            workbook.close()
+    
+    def _resolve_gl_detail_columns(self, columns, aliases: Dict) -> Dict:
+        """Match GL detail export headers to account/description/department/entity/debit/credit/amount roles"""
+        default_aliases = {
+            'account': ['GL Account', 'Account Code', 'Account', 'Acct'],
+            'description': ['Account Description', 'Account Name', 'Description'],
+            'department': ['Department', 'Dept'],
+            'entity': ['Entity', 'Entity ID', 'Property'],
+            'debit': ['Debit'],
+            'credit': ['Credit'],
+            'amount': ['Amount', 'Net']
+        }
+        
+        resolved = {}
+        normalized = {str(col).strip().lower(): col for col in columns}
+        for role, defaults in default_aliases.items():
+            for alias in aliases.get(role, defaults):
+                if alias.lower() in normalized:
+                    resolved[role] = normalized[alias.lower()]
+                    break
+        
+        if 'account' not in resolved:
+            raise ValueError(f"No account column found in GL detail columns: {list(columns)}")
+        if 'amount' not in resolved and not ('debit' in resolved and 'credit' in resolved):
+            raise ValueError("GL detail needs Debit and Credit columns or a signed Amount column")
+        
+        return resolved
+    
+    def _rollup_gl_chunk(self, chunk: pd.DataFrame, columns: Dict) -> pd.DataFrame:
+        """Group one chunk of journal lines into debit/credit totals per account (and department)"""
+        lines = pd.DataFrame({'Account': chunk[columns['account']].fillna('').astype(str).str.strip()})
+        
+        if 'debit' in columns and 'credit' in columns:
+            lines['Debit'] = pd.to_numeric(chunk[columns['debit']], errors='coerce').fillna(0)
+            lines['Credit'] = pd.to_numeric(chunk[columns['credit']], errors='coerce').fillna(0)
+        else:
+            amount = pd.to_numeric(chunk[columns['amount']], errors='coerce').fillna(0)
+            lines['Debit'] = amount.clip(lower=0)
+            lines['Credit'] = (-amount).clip(lower=0)
+        
+        if 'description' in columns:
+            lines['Description'] = chunk[columns['description']]
+        else:
+            lines['Description'] = lines['Account']
+        
+        keys = ['Account']
+        if 'entity' in columns:
+            lines['Entity'] = chunk[columns['entity']].fillna('').astype(str).str.strip()
+            keys.insert(0, 'Entity')
+        if 'department' in columns:
+            default_department = self.system_config.get('entity_config', {}).get('default_department', '@')
+            lines['Department'] = chunk[columns['department']].fillna(default_department).astype(str).str.strip()
+            keys.append('Department')
+        
+        lines = lines[lines['Account'].ne('') & lines['Account'].ne('nan')]
+        return lines.groupby(keys, sort=False).agg(
+            Description=('Description', 'first'),
+            Debit=('Debit', 'sum'),
+            Credit=('Credit', 'sum')
+        )
+    
+    def _combine_rollups(self, totals: pd.DataFrame, partial: pd.DataFrame) -> pd.DataFrame:
+        """Fold a chunk's partial totals into the running totals"""
+        combined = pd.concat([totals, partial])
+        return combined.groupby(level=list(range(combined.index.nlevels)), sort=False).agg(
+            Description=('Description', 'first'),
+            Debit=('Debit', 'sum'),
+            Credit=('Credit', 'sum')
+        )
+    
+    def _read_csv_trial_balance(self, file_path: Path) -> pd.DataFrame:
+        """Stream CSV trial balance in chunks, dropping zero-balance rows as they are read"""
+        chunk_size = self.system_config.get('processing_rules', {}).get('ingest_chunk_size', 50000)
+        
+        # Read key columns as text; only balances are converted to numbers (during cleaning)
+        chunks = [
+            self._apply_ingestion_predicates(chunk)
+            for chunk in pd.read_csv(file_path, chunksize=chunk_size, dtype={col: str for col in self._key_columns()})
+        ]
+        
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
+    
+    def _key_columns(self) -> List[str]:
+        """Code columns of a raw CSV that must be read as text to keep leading zeros"""
+        key_columns = ['Account', 'GL Account', 'Entity', 'Department']
+        entity_column = self.system_config.get('entity_config', {}).get('entity_column')
+        if entity_column:
+            key_columns.append(entity_column)
+        return key_columns
+    
+    def _apply_ingestion_predicates(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Drop rows that cannot produce activity before they reach cleaning and mapping
+        
+        A row with a zero balance in its own file behaves exactly like a missing row
+        once prior and current are outer-merged with zero fill, so an account that is
+        zero in both periods disappears here and an account that is zero in only one
+        period still produces the same activity.
+        """
+        if not self.system_config.get('processing_rules', {}).get('zero_activity_exclude', False):
+            return df
+        
+        net = self._ingestion_net(df)
+        if net is None:
+            return df
+        
+        precision = self.system_config.get('processing_rules', {}).get('rounding_precision', 2)
+        return df[net.round(precision) != 0]
+    
+    def _ingestion_net(self, df: pd.DataFrame) -> Optional[pd.Series]:
+        """Numeric net balance of raw rows, resolved in the same order as cleaning"""
+        if 'Net' in df.columns:
+            return pd.to_numeric(df['Net'], errors='coerce').fillna(0)
+        if 'Debit' in df.columns and 'Credit' in df.columns:
+            debit = pd.to_numeric(df['Debit'], errors='coerce').fillna(0)
+            credit = pd.to_numeric(df['Credit'], errors='coerce').fillna(0)
+            return debit - credit
+        if 'Ending_Balance' in df.columns:
+            return pd.to_numeric(df['Ending_Balance'], errors='coerce').fillna(0)
+        return None
+    
     def _parse_excel_trial_balance(self, file_path: Path) -> Optional[pd.DataFrame]:
         """Parse Excel trial balance file (handles complex formats)"""
         try:
@@ -206,38 +767,158 @@ class EnhancedTrialBalanceProcessor:
             if 'Description' not in df.columns:
                 df['Description'] = df['Account']
             
+            # Consolidated exports carry an entity per row
+            df = self._extract_entity(df)
+            
+            # Split segmented account codes into base account and department
+            df = self._apply_account_segments(df)
+            
+            # Normalize department segment when the source carries one
+            if 'Department' in df.columns:
+                default_department = self.system_config.get('entity_config', {}).get('default_department', '@')
+                df['Department'] = df['Department'].fillna(default_department).astype(str).str.strip()
+            
             return df
             
         except Exception as e:
             self.logger.error(f"Error cleaning trial balance data: {e}")
             return df
     
+    def _extract_entity(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Populate the Entity column for multi-entity trial balances
+        
+        Uses the configured entity column when the file has one, otherwise the
+        'entity' group of entity_account_pattern applied to the account code (its
+        optional 'account' group becomes the account used for mapping). Rows without
+        an entity get an empty value and fall back to the run's entity id on import.
+        """
+        entity_config = self.system_config.get('entity_config', {})
+        entity_column = entity_config.get('entity_column')
+        pattern = entity_config.get('entity_account_pattern')
+        
+        if entity_column and entity_column in df.columns:
+            df = df.rename(columns={entity_column: 'Entity'})
+        elif pattern:
+            segments = df['Account'].str.extract(pattern)
+            if 'entity' in segments.columns:
+                df['Entity'] = segments['entity']
+            if 'account' in segments.columns:
+                df['Account'] = segments['account'].fillna(df['Account']).str.strip()
+        
+        if 'Entity' in df.columns:
+            df['Entity'] = df['Entity'].fillna('').astype(str).str.strip()
+        
+        return df
+    
+    def _apply_account_segments(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace segmented account codes with their base mapping account and department
+        
+        Segments are parsed for all rows at once by the mapping engine. Codes with their
+        own exact mapping keep it and are not rewritten. Lines that share a base account
+        and department (e.g. different sub-accounts) are summed into one balance line so
+        activity is computed per (account, department).
+        """
+        segments = self.mapping_engine.parse_account_segments(df['Account'])
+        if segments is None:
+            return df
+        
+        parsed = self.mapping_engine.segment_parsed_mask(segments)
+        if not parsed.any():
+            return df
+        
+        exact = pd.Series(False, index=df.index)
+        for index, engine in self._entity_engines(df):
+            exact.loc[index] = engine.exact_mapping_mask(df.loc[index, 'Account'])
+        rewrite = parsed & ~exact
+        
+        df = df.copy()
+        df.loc[rewrite, 'Account'] = self.mapping_engine.segment_mapping_accounts(segments)[rewrite]
+        
+        if 'Department' not in df.columns:
+            default_department = self.system_config.get('entity_config', {}).get('default_department', '@')
+            df['Department'] = self.mapping_engine.segment_departments(segments, default_department)
+        
+        keys = [col for col in ['Entity', 'Account', 'Department'] if col in df.columns]
+        numeric_cols = ['Debit', 'Credit', 'Net', 'Ending_Balance', 'Balance_Forward']
+        aggregations = {
+            col: 'sum' if col in numeric_cols else 'first'
+            for col in df.columns if col not in keys
+        }
+        
+        return df.groupby(keys, sort=False, as_index=False).agg(aggregations)
+    
+    def _balance_dimensions(self, prior_tb: pd.DataFrame, current_tb: pd.DataFrame) -> Tuple[List[str], pd.DataFrame, pd.DataFrame]:
+        """
+        Key columns identifying one balance line, with both frames aligned to them
+        
+        Balances split by entity or department are matched per (entity, account,
+        department); a frame lacking a dimension the other has gets its default.
+        """
+        entity_config = self.system_config.get('entity_config', {})
+        defaults = {
+            'Entity': '',
+            'Department': entity_config.get('default_department', '@')
+        }
+        
+        keys = ['Account']
+        for dimension in ['Entity', 'Department']:
+            if dimension in prior_tb.columns or dimension in current_tb.columns:
+                prior_tb = prior_tb.assign(**{dimension: prior_tb.get(dimension, defaults[dimension])})
+                current_tb = current_tb.assign(**{dimension: current_tb.get(dimension, defaults[dimension])})
+                keys.append(dimension)
+        
+        return keys, prior_tb, current_tb
+    
     def calculate_activity_with_mapping(self) -> bool:
         """Calculate activity and apply account mappings"""
+        return self.calculate_activity() and self.apply_account_mappings()
+    
+    def calculate_activity(self) -> bool:
+        """Calculate material period-over-period activity, before account mapping"""
         try:
             if self.prior_tb is None or self.current_tb is None:
                 raise ValueError("Trial balance data not loaded")
             
+            keys, prior_tb, current_tb = self._balance_dimensions(self.prior_tb, self.current_tb)
+            
             # Merge prior and current on account
             merged = pd.merge(
-                self.prior_tb[['Account', 'Description', 'Net']].rename(columns={'Net': 'Prior_Net'}),
-                self.current_tb[['Account', 'Description', 'Net']].rename(columns={'Net': 'Current_Net'}),
-                on='Account',
+                prior_tb[keys + ['Description', 'Net']].rename(columns={'Net': 'Prior_Net'}),
+                current_tb[keys + ['Description', 'Net']].rename(columns={'Net': 'Current_Net'}),
+                on=keys,
                 how='outer',
                 suffixes=('_prior', '_current')
-            ).fillna(0)
+            )
+            merged[['Prior_Net', 'Current_Net']] = merged[['Prior_Net', 'Current_Net']].fillna(0)
             
             # Use description from current period, fallback to prior
-            merged['Description'] = merged['Description_current'].fillna(merged['Description_prior'])
+            merged['Description'] = merged['Description_current'].fillna(merged['Description_prior']).fillna('')
             merged = merged.drop(['Description_prior', 'Description_current'], axis=1)
             
             # Calculate activity
             merged['Activity'] = merged['Current_Net'] - merged['Prior_Net']
             
-            # Apply account mappings
-            merged['MRI_Account'] = merged['Account'].apply(
-                lambda x: self.mapping_engine.transform_account(x, merged[merged['Account'] == x]['Description'].iloc[0] if len(merged[merged['Account'] == x]) > 0 else "")
-            )
+            # Apply materiality threshold before mapping so only surviving accounts are mapped
+            threshold = self.system_config.get('processing_rules', {}).get('materiality_threshold', 0.01)
+            self.activity_data = merged[np.abs(merged['Activity']) >= threshold].copy()
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error calculating activity: {e}")
+            return False
+    
+    def apply_account_mappings(self) -> bool:
+        """Map calculated activity to MRI accounts"""
+        try:
+            if self.activity_data is None:
+                raise ValueError("Activity data not calculated")
+            
+            merged = self.activity_data.copy()
+            
+            # Apply account mappings once per distinct account
+            merged['MRI_Account'] = self._map_accounts(merged)
             
             # Filter out unmapped accounts if required
             if self.system_config.get('validation_rules', {}).get('require_account_mapping', True):
@@ -247,19 +928,37 @@ class EnhancedTrialBalanceProcessor:
                 
                 merged = merged[merged['MRI_Account'].notna()]
             
-            # Apply materiality threshold
-            threshold = self.system_config.get('processing_rules', {}).get('materiality_threshold', 0.01)
-            merged = merged[np.abs(merged['Activity']) >= threshold]
-            
             self.activity_data = merged
             
             self.logger.info(f"Activity calculated with mappings - {len(self.activity_data)} accounts with material changes")
             return True
             
         except Exception as e:
-            self.logger.error(f"Error calculating activity with mapping: {e}")
+            self.logger.error(f"Error applying account mappings: {e}")
             return False
     
+    def _map_accounts(self, activity: pd.DataFrame) -> pd.Series:
+        """Map source accounts in bulk through the mapping engine's indexes, per entity"""
+        targets = pd.Series(None, index=activity.index, dtype=object)
+        for index, engine in self._entity_engines(activity):
+            targets.loc[index] = engine.map_accounts(activity.loc[index, 'Account'], activity.loc[index, 'Description'])
+        return targets
+    
+    def _entity_engines(self, df: pd.DataFrame):
+        """
+        Yield (row index, mapping engine view) for each entity in the frame
+        
+        Rows of consolidated trial balances map with their own Entity's overlay; rows
+        without an entity use the run's entity_id.
+        """
+        if 'Entity' in df.columns:
+            entities = df['Entity'].fillna('').astype(str).replace('', self.entity_id or '')
+        else:
+            entities = pd.Series(self.entity_id or '', index=df.index)
+        
+        for entity, index in entities.groupby(entities, sort=False).groups.items():
+            yield index, self.mapping_engine.for_entity(entity or None)
+    
     def generate_mri_import_file(self, period: str, entity_id: Optional[str] = None) -> bool:
         """Generate MRI import file"""
         try:
@@ -297,9 +996,35 @@ class EnhancedTrialBalanceProcessor:
                 self.prior_tb,
                 self.current_tb,
                 self.activity_data,
-                account_mappings
+                account_mappings,
+                chart=self.mapping_engine.get_chart_frame()
             )
             
+            # Candidate targets for every unmapped account, to speed up fixing the mapping
+            mapping_result = self.validation_results['validations'].get('account_mapping', {})
+            suggestion_config = self.system_config.get('mapping_suggestions', {})
+            if mapping_result.get('unmapped_accounts') and suggestion_config.get('enabled', True):
+                descriptions = self._account_descriptions()
+                mapping_result['suggestions'] = self.mapping_engine.suggest_mappings(
+                    mapping_result['unmapped_accounts'],
+                    descriptions,
+                    suggestion_config.get('top_k', 3),
+                    suggestion_config.get('min_score', 0.0)
+                )
+            
+            # Chart compliance needs the generated import lines
+            if self.mri_import_data is not None and \
+               self.system_config.get('validation_rules', {}).get('verify_target_chart_compliance', True):
+                compliance = self.validation_engine.validate_chart_compliance(
+                    self.mri_import_data,
+                    self.mapping_engine.get_chart_frame(),
+                    self.mapping_engine.get_target_source_types()
+                )
+                self.validation_results['validations']['chart_compliance'] = compliance
+                if compliance['status'] == 'FAIL' and self.validation_results['overall_status'] != 'ERROR':
+                    self.validation_results['overall_status'] = 'FAIL'
+                    self.validation_results.setdefault('failed_validations', []).append('chart_compliance')
+            
             status = self.validation_results['overall_status']
             self.logger.info(f"Comprehensive validation completed: {status}")
             return status in ['PASS', 'WARNING']
@@ -308,6 +1033,14 @@ class EnhancedTrialBalanceProcessor:
             self.logger.error(f"Error running validation: {e}")
             return False
     
+    def _account_descriptions(self) -> Dict[str, str]:
+        """Description of each loaded account, current period taking precedence"""
+        descriptions = {}
+        for tb in [self.prior_tb, self.current_tb]:
+            if tb is not None and 'Description' in tb.columns:
+                descriptions.update(zip(tb['Account'].astype(str), tb['Description'].fillna('').astype(str)))
+        return descriptions
+    
     def export_mri_import_file(self, output_path: Path) -> bool:
         """Export MRI import file to CSV"""
         try:
@@ -320,6 +1053,281 @@ class EnhancedTrialBalanceProcessor:
             self.logger.error(f"Error exporting MRI import file: {e}")
             return False
     
+    def export_excel_report(self, output_path: Path, variance_report: Optional[pd.DataFrame] = None) -> bool:
+        """Export MRI import, validation results and optional variance report to one XLSX workbook"""
+        try:
+            if self.mri_import_data is None:
+                raise ValueError("MRI import data not generated")
+            
+            sheets = {'MRI Import': self.mri_import_data}
+            if self.validation_results is not None:
+                sheets['Validation'] = self.validation_engine.get_validation_frame(self.validation_results)
+            if variance_report is not None:
+                sheets['Variance Report'] = variance_report
+            
+            return self.excel_writer.write_workbook(
+                output_path,
+                sheets,
+                date_columns={'MRI Import': ['ENTRDATE']}
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error exporting Excel report: {e}")
+            return False
+    
+    def save_stages(self, output_dir: Path, run_id: str) -> Dict[str, Path]:
+        """
+        Write every computed stage frame to Arrow IPC files another process can memory-map
+        
+        Returns:
+            Mapping of stage attribute (e.g. 'activity_data') to the file written
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        written = {}
+        for attribute, stage in STAGE_ATTRIBUTES.items():
+            frame = getattr(self, attribute)
+            if frame is None:
+                continue
+            
+            path = output_dir / f"{run_id}_{attribute}.arrow"
+            if self.stage_store.write_frame(stage, frame, path, {'run_id': run_id, 'attribute': attribute}):
+                written[attribute] = path
+        
+        return written
+    
+    def load_stages(self, input_dir: Path, run_id: str) -> List[str]:
+        """
+        Restore stage frames written by save_stages so processing can continue from them
+        
+        Returns:
+            Stage attributes that were restored
+        """
+        input_dir = Path(input_dir)
+        
+        loaded = []
+        for attribute, stage in STAGE_ATTRIBUTES.items():
+            path = input_dir / f"{run_id}_{attribute}.arrow"
+            if not path.exists():
+                continue
+            
+            frame = self.stage_store.read_frame(path, stage)
+            if frame is not None:
+                setattr(self, attribute, frame)
+                loaded.append(attribute)
+        
+        self.logger.info(f"Loaded stages for run {run_id}: {loaded}")
+        return loaded
+    
+    def build_stage_graph(self,
+                          prior_path: Path,
+                          current_path: Optional[Path] = None,
+                          period: Optional[str] = None,
+                          entity_id: Optional[str] = None,
+                          output_path: Optional[Path] = None,
+                          input_mode: str = 'trial_balance') -> StageGraph:
+        """
+        Describe processing as lazily evaluated stages
+        
+        load -> clean -> activity -> map -> generate -> validate / export. Callers run
+        only the stage whose output they need (e.g. graph.run('validate')); its
+        dependencies run first and no stage runs twice. Outputs stay on the processor.
+        """
+        self.entity_id = entity_id
+        self._use_run_period_mapping(period)
+        graph = StageGraph()
+        graph.add_stage('load', lambda: self.read_trial_balances(prior_path, current_path, input_mode))
+        graph.add_stage('clean', self.clean_trial_balances, ['load'])
+        graph.add_stage('activity', self.calculate_activity, ['clean'])
+        graph.add_stage('map', self.apply_account_mappings, ['activity'])
+        graph.add_stage('generate', lambda: self.generate_mri_import_file(period, entity_id), ['map'])
+        graph.add_stage('validate', self.run_comprehensive_validation, ['generate'])
+        graph.add_stage('export', lambda: self.export_mri_import_file(output_path), ['generate'])
+        return graph
+    
+    def run_pipeline(self,
+                     prior_path: Path,
+                     current_path: Path,
+                     period: str,
+                     output_path: Path,
+                     entity_id: Optional[str] = None,
+                     input_mode: str = 'trial_balance',
+                     run_id: Optional[str] = None,
+                     checkpoint_dir: Optional[Path] = None) -> bool:
+        """
+        Run load, activity, import generation, validation and export in one call
+        
+        With checkpointing enabled (checkpoint_dir given, or checkpoints.enabled in the
+        system config), every completed stage is saved under the run id together with a
+        hash of the inputs. A rerun with the same inputs resumes after the last valid
+        checkpoint instead of starting again from file parsing.
+        
+        Returns:
+            True if the MRI import file was exported
+        """
+        try:
+            self.entity_id = entity_id
+            self._use_run_period_mapping(period)
+            checkpoint_config = self.system_config.get('checkpoints', {})
+            if checkpoint_dir is None and checkpoint_config.get('enabled', False):
+                checkpoint_dir = self.config_dir / checkpoint_config.get('directory', 'temp/checkpoints')
+            
+            steps = [
+                ('cleaned', lambda: self.load_trial_balances(prior_path, current_path, input_mode)),
+                ('activity', self.calculate_activity_with_mapping),
+                ('import', lambda: self.generate_mri_import_file(period, entity_id)),
+                ('validation', self.run_comprehensive_validation)
+            ]
+            
+            run_dir = None
+            completed = []
+            if checkpoint_dir is not None:
+                input_hash = self._compute_input_hash(prior_path, current_path, period, entity_id, input_mode)
+                run_id = run_id or input_hash[:16]
+                run_dir = Path(checkpoint_dir) / run_id
+                completed = self._restore_checkpoints(run_dir, input_hash)
+                self.checkpoint_info = {'run_id': run_id, 'resumed_stages': list(completed)}
+            
+            for stage, step in steps:
+                if stage in completed:
+                    continue
+                
+                # Validation failures are reported in the results, not treated as a crash
+                if not step() and stage != 'validation':
+                    self.logger.error(f"Pipeline stopped at stage {stage}")
+                    return False
+                
+                if run_dir is not None:
+                    self._save_checkpoint(run_dir, input_hash, stage)
+            
+            if not self.export_mri_import_file(output_path):
+                return False
+            
+            if run_dir is not None and not checkpoint_config.get('keep_on_success', False):
+                shutil.rmtree(run_dir, ignore_errors=True)
+            
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error running pipeline: {e}")
+            return False
+    
+    def _compute_input_hash(self, prior_path: Path, current_path: Path, period: str,
+                            entity_id: Optional[str], input_mode: str) -> str:
+        """Hash of input files, run parameters and mapping/config state identifying a run"""
+        digest = hashlib.sha256()
+        
+        for path in [prior_path, current_path]:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        
+        digest.update(json.dumps({
+            'period': period,
+            'entity_id': entity_id,
+            'input_mode': input_mode,
+            'system_config': self.system_config,
+            'gl_mapping': self.mapping_engine.gl_mapping
+        }, sort_keys=True, default=str).encode())
+        
+        return digest.hexdigest()
+    
+    def _restore_checkpoints(self, run_dir: Path, input_hash: str) -> List[str]:
+        """
+        Load the contiguous run of completed stages saved for these inputs
+        
+        Returns:
+            Stages restored, in order; empty if there is no usable checkpoint
+        """
+        manifest_path = run_dir / 'manifest.json'
+        if not manifest_path.exists():
+            return []
+        
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable checkpoint manifest {manifest_path}: {e}")
+            return []
+        
+        if manifest.get('input_hash') != input_hash:
+            self.logger.info(f"Inputs changed since checkpoint in {run_dir}, starting fresh")
+            shutil.rmtree(run_dir, ignore_errors=True)
+            return []
+        
+        restored = []
+        for stage, attributes in CHECKPOINT_STAGES:
+            if stage not in manifest.get('completed', []):
+                break
+            
+            values = {attribute: self._read_checkpoint_value(run_dir, attribute) for attribute in attributes}
+            if any(value is None for value in values.values()):
+                self.logger.warning(f"Checkpoint for stage {stage} is incomplete, resuming before it")
+                break
+            
+            for attribute, value in values.items():
+                setattr(self, attribute, value)
+            restored.append(stage)
+        
+        if restored:
+            self.logger.info(f"Resuming run from checkpoint after stage {restored[-1]}")
+        return restored
+    
+    def _save_checkpoint(self, run_dir: Path, input_hash: str, stage: str):
+        """Persist the outputs of a completed stage and record it in the run manifest"""
+        run_dir.mkdir(parents=True, exist_ok=True)
+        attributes = dict(CHECKPOINT_STAGES)[stage]
+        
+        for attribute in attributes:
+            if not self._write_checkpoint_value(run_dir, attribute):
+                self.logger.warning(f"Could not checkpoint {attribute}, stage {stage} will rerun on resume")
+                return
+        
+        manifest_path = run_dir / 'manifest.json'
+        completed = []
+        if manifest_path.exists():
+            with open(manifest_path, 'r') as f:
+                completed = json.load(f).get('completed', [])
+        
+        manifest = {
+            'input_hash': input_hash,
+            'completed': completed + [stage],
+            'updated': datetime.now().isoformat()
+        }
+        tmp_path = manifest_path.with_name('manifest.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        tmp_path.replace(manifest_path)
+    
+    def _write_checkpoint_value(self, run_dir: Path, attribute: str) -> bool:
+        """Write one stage attribute: frames as Arrow IPC, validation results as JSON"""
+        value = getattr(self, attribute)
+        if value is None:
+            return False
+        
+        if attribute in STAGE_ATTRIBUTES:
+            return self.stage_store.write_frame(STAGE_ATTRIBUTES[attribute], value, run_dir / f"{attribute}.arrow")
+        
+        with open(run_dir / f"{attribute}.json", 'w') as f:
+            json.dump(value, f, default=str)
+        return True
+    
+    def _read_checkpoint_value(self, run_dir: Path, attribute: str):
+        """Read one stage attribute written by _write_checkpoint_value, or None"""
+        if attribute in STAGE_ATTRIBUTES:
+            path = run_dir / f"{attribute}.arrow"
+            return self.stage_store.read_frame(path, STAGE_ATTRIBUTES[attribute]) if path.exists() else None
+        
+        path = run_dir / f"{attribute}.json"
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except Exception:
+            return None
+    
     def get_processing_summary(self) -> Dict:
         """Get comprehensive processing summary"""
         try:
@@ -349,6 +1357,10 @@ class EnhancedTrialBalanceProcessor:
             if self.mri_import_data is not None:
                 summary['import_summary'] = self.import_generator.get_import_summary(self.mri_import_data)
             
+            # Checkpoint summary
+            if self.checkpoint_info is not None:
+                summary['checkpoint_summary'] = self.checkpoint_info
+            
             # Validation summary
             if self.validation_results is not None:
                 summary['validation_summary'] = {
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Stage Graph
+Lazily evaluated, memoized processing stages with explicit dependencies
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional
+
+
+class StageGraph:
+    """
+    Small dependency graph of processing stages
+    Each stage is a callable returning True on success; running a stage runs its
+    dependencies first, and every stage executes at most once per graph
+    """
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.stages = {}
+        self.results = {}
+        self.failed_stage = None
+    
+    def add_stage(self, name: str, func: Callable[[], bool], depends_on: Optional[List[str]] = None):
+        """
+        Register a stage
+        
+        Args:
+            name: Stage name
+            func: Callable doing the work; its outputs live on the owning processor
+            depends_on: Stages that must complete successfully before this one
+        """
+        for dependency in depends_on or []:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dependency}")
+        
+        self.stages[name] = {'func': func, 'depends_on': list(depends_on or [])}
+    
+    def run(self, name: str) -> bool:
+        """
+        Compute a stage and everything it depends on, reusing earlier results
+        
+        Returns:
+            True if the stage and all of its dependencies succeeded
+        """
+        if name not in self.stages:
+            raise ValueError(f"Unknown stage: {name}")
+        
+        if name in self.results:
+            return self.results[name]
+        
+        stage = self.stages[name]
+        for dependency in stage['depends_on']:
+            if not self.run(dependency):
+                self.results[name] = False
+                return False
+        
+        self.logger.info(f"Running stage {name}")
+        success = bool(stage['func']())
+        self.results[name] = success
+        
+        if not success and self.failed_stage is None:
+            self.failed_stage = name
+            self.logger.warning(f"Stage {name} did not succeed")
+        
+        return success
+    
+    def is_computed(self, name: str) -> bool:
+        """Whether a stage has already run (successfully or not)"""
+        return name in self.results
+    
+    def get_computed_stages(self) -> Dict[str, bool]:
+        """Stages run so far and whether each succeeded, in execution order"""
+        return dict(self.results)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Stage Store
+Columnar interchange format for frames handed between pipeline stages
+"""
+
+import pandas as pd
+import numpy as np
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Format version written into every stage file; bump when a stage schema changes
+STAGE_FORMAT_VERSION = 1
+
+# Column contract per stage: required columns, optional dimension columns and numeric columns
+STAGE_SCHEMAS = {
+    'trial_balance': {
+        'required': ['Account', 'Description', 'Net'],
+        'optional': ['Entity', 'Department', 'Debit', 'Credit', 'Ending_Balance', 'Balance_Forward'],
+        'numeric': ['Net', 'Debit', 'Credit', 'Ending_Balance', 'Balance_Forward']
+    },
+    'activity': {
+        'required': ['Account', 'Description', 'Prior_Net', 'Current_Net', 'Activity', 'MRI_Account'],
+        'optional': ['Entity', 'Department', 'Period'],
+        'numeric': ['Prior_Net', 'Current_Net', 'Activity']
+    },
+    'mri_import': {
+        'required': [
+            'PERIOD', 'REF', 'SOURCE', 'ENTITYID', 'ACCTNUM', 'DEPARTMENT',
+            'AMT', 'DESCRPN', 'ENTRDATE', 'STATUS', 'BASIS', 'AUDITFLAG',
+            'ADDLDESC', 'ASSETCLASS', 'ASSETCODE', 'INTERENTITY'
+        ],
+        'optional': [],
+        'numeric': ['AMT']
+    }
+}
+
+
+class StageStore:
+    """
+    Reads and writes pipeline stage frames as Arrow IPC files
+    Files are uncompressed so other processes can memory-map them without copying
+    """
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+    
+    def write_frame(self, stage: str, df: pd.DataFrame, path: Path, metadata: Optional[Dict] = None) -> bool:
+        """
+        Write a stage frame to an Arrow IPC file
+        
+        Args:
+            stage: Stage name from STAGE_SCHEMAS ('trial_balance', 'activity', 'mri_import')
+            df: Frame produced by the stage
+            path: Target file (conventionally *.arrow)
+            metadata: Extra JSON-serializable metadata stored in the file schema
+        """
+        try:
+            import pyarrow as pa
+            
+            frame = self._conform(stage, df)
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            
+            stage_metadata = {
+                'stage': stage,
+                'format_version': STAGE_FORMAT_VERSION,
+                'rows': len(frame)
+            }
+            stage_metadata.update(metadata or {})
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                b'stage_metadata': json.dumps(stage_metadata, default=str).encode()
+            })
+            
+            path = Path(path)
+            tmp_path = path.with_name(path.name + '.tmp')
+            with pa.OSFile(str(tmp_path), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            tmp_path.replace(path)
+            
+            self.logger.info(f"Wrote {stage} stage ({len(frame)} rows) to {path}")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Error writing {stage} stage to {path}: {e}")
+            return False
+    
+    def read_table(self, path: Path):
+        """Memory-map a stage file and return the Arrow table (zero-copy)"""
+        import pyarrow as pa
+        
+        source = pa.memory_map(str(path), 'r')
+        return pa.ipc.open_file(source).read_all()
+    
+    def read_frame(self, path: Path, stage: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Read a stage file back into a pandas frame
+        
+        Args:
+            path: Stage file written by write_frame
+            stage: Expected stage name; a mismatch is treated as an error
+        """
+        try:
+            table = self.read_table(path)
+            metadata = self.read_metadata(table)
+            
+            if metadata.get('format_version') != STAGE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported stage format version: {metadata.get('format_version')}")
+            if stage and metadata.get('stage') != stage:
+                raise ValueError(f"Expected {stage} stage, found {metadata.get('stage')}")
+            
+            return table.to_pandas()
+        
+        except Exception as e:
+            self.logger.error(f"Error reading stage file {path}: {e}")
+            return None
+    
+    def read_metadata(self, table) -> Dict:
+        """Stage metadata stored in an Arrow table's schema"""
+        raw = (table.schema.metadata or {}).get(b'stage_metadata')
+        return json.loads(raw) if raw else {}
+    
+    def _conform(self, stage: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Select and type the columns of a frame according to its stage schema"""
+        if stage not in STAGE_SCHEMAS:
+            raise ValueError(f"Unknown stage: {stage}")
+        
+        schema = STAGE_SCHEMAS[stage]
+        missing = [col for col in schema['required'] if col not in df.columns]
+        if missing:
+            raise ValueError(f"{stage} frame is missing columns: {missing}")
+        
+        columns = schema['required'] + [col for col in schema['optional'] if col in df.columns]
+        frame = df[columns].reset_index(drop=True).copy()
+        
+        for col in columns:
+            if col in schema['numeric']:
+                frame[col] = pd.to_numeric(frame[col], errors='coerce').astype(np.float64)
+            else:
+                # Text columns keep nulls as nulls and everything else as strings
+                frame[col] = frame[col].astype('string')
+        
+        return frame
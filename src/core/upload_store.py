@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Upload Store
+Resumable chunked uploads assembled on disk and kept as content-addressed files
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Content hashes are lowercase hex SHA-256 digests
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(ValueError):
+    """Rejected upload request; status is the HTTP status to report"""
+    
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUploadStore:
+    """
+    Initiate -> upload numbered chunks (any order, retries allowed) -> finalize
+    
+    Each chunk is written straight to its offset in a pre-sized part file, so the file is
+    assembled incrementally and an interrupted transfer resumes with the chunks still
+    missing. A receipt holding the chunk's SHA-256 is written per chunk; resending a chunk
+    with the same content is a no-op. Finalized files are stored under their SHA-256, so
+    a file uploaded twice is kept once. A file id is only handed out once its bytes have
+    been sent and verified, so knowing a hash does not grant access to a stored file.
+    """
+    
+    def __init__(self, root: Path, chunk_size: int, max_file_size: int,
+                 max_chunk_size: Optional[int] = None):
+        """
+        Args:
+            root: Directory holding upload sessions and stored files
+            chunk_size: Chunk size offered to clients that do not choose one
+            max_file_size: Largest file accepted, in bytes
+            max_chunk_size: Largest chunk a client may choose (the request body limit)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.root = Path(root)
+        self.sessions_dir = self.root / 'sessions'
+        self.files_dir = self.root / 'files'
+        self.chunk_size = chunk_size
+        self.max_file_size = max_file_size
+        self.max_chunk_size = max_chunk_size
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+    
+    def initiate(self, filename: str, size: int, chunk_size: Optional[int] = None,
+                 sha256: Optional[str] = None) -> Dict:
+        """
+        Start an upload session
+        
+        Args:
+            filename: Original file name (its extension is kept)
+            size: Total file size in bytes
+            chunk_size: Requested chunk size (defaults to the store's, capped at max_chunk_size)
+            sha256: Expected content hash, checked again at finalize
+        
+        Returns:
+            Session status
+        """
+        size = int(size)
+        chunk_size = int(chunk_size or self.chunk_size)
+        if self.max_chunk_size:
+            # A larger chunk could never be sent in one request
+            chunk_size = min(chunk_size, self.max_chunk_size)
+        if size <= 0 or chunk_size <= 0:
+            raise UploadError('File size and chunk size must be positive')
+        if size > self.max_file_size:
+            raise UploadError(f'File too large. Maximum size is {self.max_file_size // (1024 * 1024)}MB.', 413)
+        if sha256 and not HASH_PATTERN.match(sha256.lower()):
+            raise UploadError('sha256 must be a hex SHA-256 digest')
+        
+        upload_id = uuid.uuid4().hex
+        session_dir = self.sessions_dir / upload_id
+        (session_dir / 'received').mkdir(parents=True)
+        
+        manifest = {
+            'upload_id': upload_id,
+            'filename': Path(filename).name,
+            'size': size,
+            'chunk_size': chunk_size,
+            'total_chunks': -(-size // chunk_size),
+            'sha256': sha256.lower() if sha256 else None,
+            'created_at': time.time()
+        }
+        with open(session_dir / 'manifest.json', 'w') as f:
+            json.dump(manifest, f)
+        
+        # Pre-size the part file so chunks can be written at their offsets in any order
+        with open(session_dir / 'data.part', 'wb') as f:
+            f.truncate(size)
+        
+        self.logger.info(f"Upload {upload_id} started: {filename}, {size} bytes in {manifest['total_chunks']} chunks")
+        return self.status(upload_id)
+    
+    def _manifest(self, upload_id: str) -> Dict:
+        """Manifest of an open session"""
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id or ''):
+            raise UploadError('Invalid upload id')
+        manifest_path = self.sessions_dir / upload_id / 'manifest.json'
+        if not manifest_path.exists():
+            raise UploadError('Upload not found or already finalized', 404)
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    
+    def _received(self, upload_id: str) -> Dict[int, str]:
+        """Chunk index -> SHA-256 of every chunk received so far"""
+        received = {}
+        for receipt in (self.sessions_dir / upload_id / 'received').glob('*'):
+            if receipt.name.isdigit():
+                received[int(receipt.name)] = receipt.read_text().strip()
+        return received
+    
+    def status(self, upload_id: str) -> Dict:
+        """Progress of a session, including the chunks still missing"""
+        manifest = self._manifest(upload_id)
+        received = self._received(upload_id)
+        missing = [index for index in range(manifest['total_chunks']) if index not in received]
+        return {
+            'upload_id': upload_id,
+            'complete': False,
+            'filename': manifest['filename'],
+            'size': manifest['size'],
+            'chunk_size': manifest['chunk_size'],
+            'total_chunks': manifest['total_chunks'],
+            'received_chunks': len(received),
+            'missing_chunks': missing
+        }
+    
+    def write_chunk(self, upload_id: str, index: int, data: bytes, sha256: Optional[str] = None) -> Dict:
+        """
+        Store one chunk at its offset
+        
+        Args:
+            index: Zero-based chunk number
+            data: Chunk bytes (chunk_size, except for the last chunk)
+            sha256: Optional checksum of the chunk, verified before writing
+        """
+        manifest = self._manifest(upload_id)
+        if not 0 <= index < manifest['total_chunks']:
+            raise UploadError(f"Chunk index must be between 0 and {manifest['total_chunks'] - 1}")
+        
+        offset = index * manifest['chunk_size']
+        expected_length = min(manifest['chunk_size'], manifest['size'] - offset)
+        if len(data) != expected_length:
+            raise UploadError(f'Chunk {index} must be {expected_length} bytes, got {len(data)}')
+        
+        digest = hashlib.sha256(data).hexdigest()
+        if sha256 and sha256.lower() != digest:
+            raise UploadError(f'Checksum mismatch for chunk {index}', 422)
+        
+        session_dir = self.sessions_dir / upload_id
+        receipt = session_dir / 'received' / str(index)
+        if receipt.exists() and receipt.read_text().strip() == digest:
+            return self.status(upload_id)
+        
+        with open(session_dir / 'data.part', 'r+b') as f:
+            f.seek(offset)
+            f.write(data)
+        
+        # Receipt last, so a chunk only counts once its bytes are on disk
+        tmp_receipt = receipt.with_name(f'{index}.{uuid.uuid4().hex}.tmp')
+        tmp_receipt.write_text(digest)
+        tmp_receipt.replace(receipt)
+        return self.status(upload_id)
+    
+    def finalize(self, upload_id: str, sha256: str) -> Dict:
+        """
+        Verify the assembled file against its checksum and store it
+        
+        Returns:
+            Dict with file_id (the SHA-256), filename and size
+        """
+        manifest = self._manifest(upload_id)
+        status = self.status(upload_id)
+        if status['missing_chunks']:
+            raise UploadError(f"{len(status['missing_chunks'])} chunks still missing", 409)
+        if not sha256:
+            raise UploadError('A SHA-256 checksum of the whole file is required')
+        if manifest['sha256'] and manifest['sha256'] != sha256.lower():
+            raise UploadError('Checksum differs from the one given when the upload was started', 422)
+        
+        session_dir = self.sessions_dir / upload_id
+        part_path = session_dir / 'data.part'
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        file_id = digest.hexdigest()
+        
+        if file_id != sha256.lower():
+            raise UploadError(f'Checksum mismatch: assembled file has SHA-256 {file_id}', 422)
+        
+        stored = self.get_file(file_id)
+        if stored is None:
+            file_dir = self.files_dir / file_id
+            file_dir.mkdir(exist_ok=True)
+            stored = file_dir / manifest['filename']
+            part_path.replace(stored)
+        else:
+            os.utime(stored)
+            self.logger.info(f"Upload {upload_id} deduplicated against stored file {file_id}")
+        
+        shutil.rmtree(session_dir, ignore_errors=True)
+        self.logger.info(f"Upload {upload_id} finalized as {file_id}")
+        return {'complete': True, 'file_id': file_id, 'filename': stored.name, 'size': manifest['size']}
+    
+    def abort(self, upload_id: str):
+        """Discard an open session"""
+        self._manifest(upload_id)
+        shutil.rmtree(self.sessions_dir / upload_id, ignore_errors=True)
+    
+    def get_file(self, file_id: str) -> Optional[Path]:
+        """Stored file for a content hash, or None"""
+        if not HASH_PATTERN.match(file_id or ''):
+            return None
+        file_dir = self.files_dir / file_id
+        files = sorted(file_dir.iterdir()) if file_dir.is_dir() else []
+        return files[0] if files else None
+    
+    def materialize(self, file_id: str, target: Path) -> Path:
+        """
+        Make a stored file available at target (hard link, or copy across filesystems)
+        
+        Processing deletes its input files, so it gets a link rather than the stored file.
+        """
+        stored = self.get_file(file_id)
+        if stored is None:
+            raise UploadError(f'Unknown uploaded file {file_id}', 404)
+        
+        # Using a stored file keeps it from expiring
+        os.utime(stored)
+        try:
+            os.link(stored, target)
+        except OSError:
+            shutil.copyfile(stored, target)
+        return target
+    
+    def cleanup(self, max_age_seconds: float) -> int:
+        """Remove sessions and stored files not touched within max_age_seconds"""
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for directory in list(self.sessions_dir.iterdir()) + list(self.files_dir.iterdir()):
+            try:
+                if directory.is_dir() and max(
+                    [directory.stat().st_mtime] + [p.stat().st_mtime for p in directory.rglob('*')]
+                ) < cutoff:
+                    shutil.rmtree(directory)
+                    removed += 1
+            except OSError as e:
+                self.logger.warning(f"Could not remove {directory}: {e}")
+        return removed
@@ -4,12 +4,29 @@ Account Mapping Engine
 Handles complex account transformations from Bitwise to MRI format
 """
 
+import copy
 import json
+import heapq
 import re
 import logging
+import string
+import numpy as np
+import pandas as pd
 from pathlib import Path
 from typing import Dict, Optional, List, Tuple
 
+from .pattern_matcher import MultiPatternMatcher
+from .mapping_suggester import MappingSuggester
+from .mapping_artifact import content_key, load_artifact, write_artifact
+
+
+# Engine attributes produced by _compile() and persisted in the mapping artifact
+COMPILED_ATTRIBUTES = [
+    'gl_mapping', 'mri_chart', 'transformation_rules', 'exact_targets', 'entity_overlays', 'chart_accounts',
+    '_prefix_index', '_prefix_lengths', '_range_starts', '_range_ends', '_range_targets',
+    '_pattern_matcher', '_consolidation_matcher', 'suggester', '_chart_frame'
+]
+
 
 class AccountMappingEngine:
     """
@@ -17,13 +34,98 @@ class AccountMappingEngine:
     Replicates Excel GL Mapping functionality
     """
     
-    def __init__(self, config_dir: Path):
+    def __init__(self, config_dir: Path, gl_mapping: Optional[Dict] = None, use_artifact: bool = True):
+        """
+        Args:
+            config_dir: Directory holding gl_mapping.json and mri_chart_of_accounts.json
+            gl_mapping: Mapping document to use instead of gl_mapping.json (e.g. a
+                version loaded from the mapping store)
+            use_artifact: Start from the precompiled mapping artifact for this mapping and
+                chart content, compiling and storing one when there is none yet
+        """
         self.logger = logging.getLogger(__name__)
         self.config_dir = Path(config_dir)
-        self.gl_mapping = self._load_gl_mapping()
-        self.mri_chart = self._load_mri_chart()
+        
+        gl_mapping = gl_mapping if gl_mapping is not None else self._load_gl_mapping()
+        mri_chart = self._load_mri_chart()
+        key = content_key(gl_mapping, mri_chart) if use_artifact else None
+        state = load_artifact(self.config_dir, key) if use_artifact else None
+        
+        if state is not None:
+            for attribute in COMPILED_ATTRIBUTES:
+                setattr(self, attribute, state[attribute])
+        else:
+            self.gl_mapping = gl_mapping
+            self.mri_chart = mri_chart
+            self._compile()
+            if use_artifact:
+                write_artifact(self.config_dir, key, self.compiled_state())
+        
+        # Exact-match tables consulted in order; entity views put their overlay first
+        self.entity_id = None
+        self.mapping_layers = [self.exact_targets]
+    
+    def _compile(self):
+        """Build flat lookup tables, rule matchers and chart indexes from the loaded JSON"""
         self.transformation_rules = self.gl_mapping.get('transformation_rules', {})
+        self.exact_targets = self._flatten_mappings(self.gl_mapping.get('account_mappings', {}))
+        self.chart_accounts = frozenset(self.mri_chart.get('accounts', {}))
+        self.entity_overlays = {
+            entity_id: self._flatten_mappings(overlay.get('account_mappings', {}))
+            for entity_id, overlay in self.gl_mapping.get('entity_overlays', {}).items()
+        }
+        for entity_id, overlay in self.entity_overlays.items():
+            unknown = sorted(set(overlay.values()) - self.chart_accounts)
+            if unknown:
+                self.logger.warning(f"Overlay for {entity_id} maps to accounts missing from the MRI chart: {unknown}")
+        self._build_mapping_index()
+        self._build_pattern_matchers()
+        self.suggester = MappingSuggester(
+            self.mri_chart.get('accounts', {}),
+            self.gl_mapping.get('account_mappings', {})
+        )
+        self._chart_frame = None
+        self.get_chart_frame()
+    
+    def compiled_state(self) -> Dict:
+        """Compiled engine state, as stored in the mapping artifact"""
+        return {attribute: getattr(self, attribute) for attribute in COMPILED_ATTRIBUTES}
+    
+    def _flatten_mappings(self, account_mappings: Dict) -> Dict[str, str]:
+        """Source account -> target account table from an 'account_mappings' section"""
+        return {account: entry['target_account'] for account, entry in account_mappings.items()}
+    
+    def for_entity(self, entity_id: Optional[str]) -> 'AccountMappingEngine':
+        """
+        Engine view applying the entity's overlay from gl_mapping.json 'entity_overlays'
+        
+        Returns the engine itself when the entity has no overlay.
+        """
+        overlay = self.entity_overlays.get(entity_id) if entity_id else None
+        if not overlay:
+            return self
+        return self._layered(overlay, entity_id)
+    
+    def with_overlay(self, account_mappings: Dict, entity_id: Optional[str] = None) -> 'AccountMappingEngine':
+        """Engine view with ad-hoc overlay mappings (gl_mapping.json 'account_mappings' format)"""
+        return self._layered(self._flatten_mappings(account_mappings), entity_id)
+    
+    def _layered(self, overlay: Dict[str, str], entity_id: Optional[str]) -> 'AccountMappingEngine':
+        """
+        Shallow copy whose exact lookups consult the overlay before this engine's tables
         
+        Indexes, matchers, the chart and the base table are shared with this engine,
+        not copied, so a view costs about the size of its overlay.
+        """
+        view = copy.copy(self)
+        view.entity_id = entity_id
+        view.mapping_layers = [overlay] + self.mapping_layers
+        return view
+    
+    def get_entity_overlay(self, entity_id: Optional[str]) -> Dict[str, str]:
+        """Flat source -> target overrides for an entity (empty when it has none)"""
+        return self.entity_overlays.get(entity_id, {}) if entity_id else {}
+    
     def _load_gl_mapping(self) -> Dict:
         """Load GL mapping configuration"""
         try:
@@ -59,16 +161,21 @@ class AccountMappingEngine:
             # Clean the source account
             cleaned_account = self._clean_account_code(source_account)
             
-            # Direct mapping lookup
-            account_mappings = self.gl_mapping.get('account_mappings', {})
+            # Try exact match first (cleaned, then original account string), overlay before base
+            for layer in self.mapping_layers:
+                if cleaned_account in layer:
+                    return layer[cleaned_account]
+                if source_account in layer:
+                    return layer[source_account]
             
-            # Try exact match first
-            if cleaned_account in account_mappings:
-                return account_mappings[cleaned_account]['target_account']
+            # Try longest prefix, then narrowest range
+            prefix_match = self._match_by_prefix(cleaned_account)
+            if prefix_match:
+                return prefix_match
             
-            # Try original account string
-            if source_account in account_mappings:
-                return account_mappings[source_account]['target_account']
+            range_match = self._match_by_range(cleaned_account)
+            if range_match:
+                return range_match
             
             # Try pattern matching
             pattern_match = self._match_by_pattern(source_account, description)
@@ -100,18 +207,177 @@ class AccountMappingEngine:
         
         return account.strip()
     
-    def _match_by_pattern(self, source_account: str, description: str) -> Optional[str]:
-        """Match account using regex patterns"""
-        mapping_patterns = self.gl_mapping.get('mapping_patterns', {})
+    def _build_mapping_index(self):
+        """
+        Index prefix_mappings and range_mappings for logarithmic lookups
+        
+        Prefixes are kept per length so the longest match is found with one dict probe
+        per distinct length. Overlapping ranges are flattened, in one O(n log n) sweep,
+        into sorted, disjoint elementary intervals, each labelled with the narrowest range
+        covering it, so a lookup is a single binary search.
+        """
+        prefix_mappings = self.gl_mapping.get('prefix_mappings', {})
+        self._prefix_index = {
+            str(prefix): entry['target_account'] for prefix, entry in prefix_mappings.items()
+        }
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefix_index}, reverse=True)
         
-        for pattern_name, pattern_config in mapping_patterns.items():
-            pattern = pattern_config.get('source_pattern', '')
-            if re.search(pattern, source_account, re.IGNORECASE) or \
-               re.search(pattern, description, re.IGNORECASE):
-                return pattern_config.get('target_account')
+        ranges = [
+            (int(entry['start']), int(entry['end']), entry['target_account'])
+            for entry in self.gl_mapping.get('range_mappings', [])
+            if int(entry['start']) <= int(entry['end'])
+        ]
+        
+        # One sweep over the sorted range starts and ends: a heap of the active ranges,
+        # narrowest first (ties go to the range declared first), with ended ranges
+        # dropped lazily when they reach the top
+        events = sorted(
+            [(start, i) for i, (start, _, _) in enumerate(ranges)] +
+            [(end + 1, -1 - i) for i, (_, end, _) in enumerate(ranges)]
+        )
+        boundaries = sorted({position for position, _ in events})
+        
+        starts, ends, targets = [], [], []
+        active, heap = set(), []
+        event = 0
+        for lower, upper in zip(boundaries, boundaries[1:]):
+            while event < len(events) and events[event][0] == lower:
+                _, i = events[event]
+                if i >= 0:
+                    active.add(i)
+                    heapq.heappush(heap, (ranges[i][1] - ranges[i][0], i))
+                else:
+                    active.discard(-1 - i)
+                event += 1
+            
+            while heap and heap[0][1] not in active:
+                heapq.heappop(heap)
+            if heap:
+                starts.append(lower)
+                ends.append(upper)
+                targets.append(ranges[heap[0][1]][2])
         
+        self._range_starts = np.array(starts, dtype=np.int64)
+        self._range_ends = np.array(ends, dtype=np.int64)
+        self._range_targets = np.array(targets, dtype=object)
+    
+    def _match_by_prefix(self, cleaned_account: str) -> Optional[str]:
+        """Target of the longest configured prefix of the account code"""
+        for length in self._prefix_lengths:
+            if len(cleaned_account) >= length and cleaned_account[:length] in self._prefix_index:
+                return self._prefix_index[cleaned_account[:length]]
+        return None
+    
+    def _match_by_range(self, cleaned_account: str) -> Optional[str]:
+        """Target of the narrowest configured range containing the account number"""
+        numeric_match = re.match(r'\d+', cleaned_account)
+        if not numeric_match or len(self._range_starts) == 0:
+            return None
+        
+        number = int(numeric_match.group(0))
+        position = np.searchsorted(self._range_starts, number, side='right') - 1
+        if position >= 0 and number < self._range_ends[position]:
+            return self._range_targets[position]
         return None
     
+    def map_accounts(self, accounts: pd.Series, descriptions: Optional[pd.Series] = None) -> pd.Series:
+        """
+        Map a Series of source accounts with the same precedence as transform_account
+        
+        Exact, prefix and range matches are resolved column-wise (dict lookups and one
+        vectorized binary search); only accounts left over go through pattern matching
+        and transformation rules, once per distinct account.
+        """
+        index = accounts.index
+        accounts = accounts.astype(str).reset_index(drop=True)
+        if descriptions is None:
+            descriptions = pd.Series('', index=accounts.index)
+        descriptions = descriptions.astype(str).reset_index(drop=True)
+        
+        cleaned = self._clean_account_codes(accounts)
+        targets = self._exact_targets(accounts, cleaned)
+        
+        # Longest prefix
+        for length in self._prefix_lengths:
+            pending = targets.isna() & (cleaned.str.len() >= length)
+            if pending.any():
+                targets[pending] = cleaned[pending].str[:length].map(self._prefix_index)
+        
+        # Narrowest range, by binary search over the elementary intervals
+        pending = targets.isna()
+        if pending.any() and len(self._range_starts) > 0:
+            numbers = pd.to_numeric(cleaned[pending].str.extract(r'^(\d+)', expand=False), errors='coerce')
+            numbers = numbers.dropna().astype(np.int64)
+            positions = np.searchsorted(self._range_starts, numbers.to_numpy(), side='right') - 1
+            inside = (positions >= 0) & (numbers.to_numpy() < self._range_ends[np.clip(positions, 0, None)])
+            targets[numbers.index[inside]] = self._range_targets[positions[inside]]
+        
+        # Patterns and transformation rules for whatever is left
+        pending = targets.isna()
+        if pending.any():
+            remaining = pd.DataFrame({'account': accounts[pending], 'description': descriptions[pending]})
+            distinct = remaining.drop_duplicates('account')
+            lookup = {
+                account: self._match_by_pattern(account, description) or self._apply_transformation_rules(account)
+                for account, description in zip(distinct['account'], distinct['description'])
+            }
+            targets[pending] = remaining['account'].map(lookup)
+        
+        targets.index = index
+        return targets.where(targets.notna(), None)
+    
+    def _clean_account_codes(self, accounts: pd.Series) -> pd.Series:
+        """Vectorized _clean_account_code"""
+        cleaned = accounts.str.split(':').str[0].str.strip()
+        for pattern in self.transformation_rules.get('remove_patterns', []):
+            cleaned = cleaned.str.replace(pattern, '', regex=True)
+        return cleaned.str.strip()
+    
+    def _exact_targets(self, accounts: pd.Series, cleaned: pd.Series) -> pd.Series:
+        """Exact matches on the cleaned and the original code, overlay before base"""
+        targets = None
+        for layer in self.mapping_layers:
+            layer_targets = cleaned.map(layer).fillna(accounts.map(layer))
+            targets = layer_targets if targets is None else targets.fillna(layer_targets)
+        return targets
+    
+    def exact_mapping_mask(self, accounts: pd.Series) -> pd.Series:
+        """Accounts with an explicit account_mappings entry (in this view's layers)"""
+        as_text = accounts.astype(str)
+        return self._exact_targets(as_text, self._clean_account_codes(as_text)).notna()
+    
+    def _build_pattern_matchers(self):
+        """Compile mapping_patterns and consolidation_rules into single-scan matchers"""
+        mapping_patterns = self.gl_mapping.get('mapping_patterns', {})
+        self._pattern_matcher = MultiPatternMatcher([
+            {
+                'name': name,
+                'pattern': config.get('source_pattern', ''),
+                'target_account': config.get('target_account'),
+                'priority': config.get('priority', order)
+            }
+            for order, (name, config) in enumerate(mapping_patterns.items())
+        ])
+        
+        self._consolidation_matcher = MultiPatternMatcher([
+            {'name': pattern, 'pattern': pattern, 'target_account': target}
+            for pattern, target in self.get_consolidation_rules().items()
+        ])
+    
+    def _match_by_pattern(self, source_account: str, description: str) -> Optional[str]:
+        """Match account using regex patterns"""
+        match = self.match_pattern_rule(source_account, description)
+        return match['target_account'] if match else None
+    
+    def match_pattern_rule(self, source_account: str, description: str = "") -> Optional[Dict]:
+        """
+        Winning mapping_patterns rule for an account code and description
+        
+        Returns:
+            Dict with rule name, target_account, priority and the other rules that matched
+        """
+        return self._pattern_matcher.match(source_account, description)
+    
     def _apply_transformation_rules(self, source_account: str) -> Optional[str]:
         """Apply automatic transformation rules"""
         try:
@@ -141,8 +407,79 @@ class AccountMappingEngine:
     
     def _validate_target_account(self, target_account: str) -> bool:
         """Validate target account exists in MRI chart"""
-        mri_accounts = self.mri_chart.get('accounts', {})
-        return target_account in mri_accounts
+        return target_account in self.chart_accounts
+    
+    def get_segment_rules(self) -> Dict:
+        """Get account segment parsing rules"""
+        return self.gl_mapping.get('account_segments', {})
+    
+    def parse_account_segments(self, accounts: pd.Series) -> Optional[pd.DataFrame]:
+        """
+        Split account codes into typed segments for every row at once
+        
+        Args:
+            accounts: Series of source account codes (e.g., "83105-1-000")
+            
+        Returns:
+            DataFrame with one column per named group of the segment pattern, kept as the
+            source text (so zero padding survives), or None when segment parsing is disabled.
+            Integer segments that are not numeric are blanked; compare them with segment_values.
+        """
+        rules = self.get_segment_rules()
+        if not rules.get('enabled', False) or not rules.get('pattern'):
+            return None
+        
+        segments = accounts.astype(str).str.extract(rules['pattern'])
+        
+        for name in rules.get('integer_segments', []):
+            if name in segments.columns:
+                segments[name] = segments[name].where(self.segment_values(segments, name).notna())
+        
+        return segments
+    
+    def segment_values(self, segments: pd.DataFrame, name: str) -> pd.Series:
+        """Numeric value of an integer segment (nullable Int64), for comparisons only"""
+        return pd.to_numeric(segments[name], errors='coerce').astype('Int64')
+    
+    def segment_parsed_mask(self, segments: pd.DataFrame) -> pd.Series:
+        """Rows whose account code matched the segment pattern"""
+        base_segment = self.get_segment_rules().get('base_segment', 'base')
+        return segments[base_segment].notna()
+    
+    def segment_mapping_accounts(self, segments: pd.DataFrame) -> pd.Series:
+        """Build the account used for mapping lookup from parsed segments"""
+        rules = self.get_segment_rules()
+        template = rules.get('mapping_account_format', '{' + rules.get('base_segment', 'base') + '}')
+        
+        result = pd.Series('', index=segments.index, dtype=object)
+        for literal, field, _, _ in string.Formatter().parse(template):
+            result = result + literal
+            if field:
+                result = result + segments[field].astype(str)
+        
+        return result
+    
+    def segment_departments(self, segments: pd.DataFrame, default_department: str) -> pd.Series:
+        """Map the department segment onto MRI DEPARTMENT codes"""
+        rules = self.get_segment_rules()
+        department_segment = rules.get('department_segment', 'department')
+        
+        if department_segment not in segments.columns:
+            return pd.Series(default_department, index=segments.index)
+        
+        departments = segments[department_segment]
+        department_map = rules.get('department_map', {})
+        
+        if department_segment in rules.get('integer_segments', []):
+            # Look codes up by value so '00' and '0' hit the same department_map entry
+            keys = self.segment_values(segments, department_segment).astype(str)
+            department_map = {str(int(code)) if str(code).isdigit() else code: mri
+                              for code, mri in department_map.items()}
+        else:
+            keys = departments
+        
+        codes = keys.map(department_map).fillna(departments)
+        return codes.where(departments.notna(), default_department)
     
     def get_account_description(self, mri_account: str) -> str:
         """Get description for MRI account"""
@@ -156,6 +493,56 @@ class AccountMappingEngine:
         account_info = mri_accounts.get(mri_account, {})
         return account_info.get('type', 'Unknown')
     
+    def get_chart_frame(self) -> pd.DataFrame:
+        """
+        MRI chart of accounts as a frame indexed by account, built once per engine
+        
+        Returns:
+            DataFrame with description, type, active and dp_restriction columns
+        """
+        if self._chart_frame is None:
+            chart = pd.DataFrame.from_dict(self.mri_chart.get('accounts', {}), orient='index')
+            for col in ['description', 'type', 'active', 'dp_restriction']:
+                if col not in chart.columns:
+                    chart[col] = None
+            chart.index.name = 'account'
+            self._chart_frame = chart[['description', 'type', 'active', 'dp_restriction']]
+        
+        return self._chart_frame
+    
+    def get_target_source_types(self) -> pd.DataFrame:
+        """
+        Source account types declared for each MRI target account
+        
+        Returns:
+            DataFrame with target_account, account_type and the chart type that account
+            type belongs in (expected_chart_type, from account_type_chart_types)
+        """
+        entries = list(self.gl_mapping.get('account_mappings', {}).values())
+        entries += list(self.gl_mapping.get('mapping_patterns', {}).values())
+        
+        types = pd.DataFrame(
+            [(entry.get('target_account'), entry.get('account_type')) for entry in entries],
+            columns=['target_account', 'account_type']
+        ).dropna().drop_duplicates()
+        
+        chart_types = self.gl_mapping.get('account_type_chart_types', {})
+        types['expected_chart_type'] = types['account_type'].map(chart_types)
+        return types.reset_index(drop=True)
+    
+    def suggest_mappings(self,
+                         source_accounts: List[str],
+                         descriptions: Optional[Dict[str, str]] = None,
+                         k: int = 3,
+                         min_score: float = 0.0) -> Dict[str, List[Dict]]:
+        """
+        Top-k candidate MRI accounts for unmapped source accounts
+        
+        Returns:
+            Source account -> list of {target_account, description, score}, best first
+        """
+        return self.suggester.suggest_many(source_accounts, descriptions, k, min_score)
+    
     def validate_all_mappings(self, source_accounts: List[str]) -> Dict:
         """
         Validate all source accounts have mappings
@@ -189,12 +576,9 @@ class AccountMappingEngine:
     
     def apply_consolidation(self, source_account: str) -> str:
         """Apply consolidation rules for special accounts"""
-        consolidation_rules = self.get_consolidation_rules()
-        
-        for source_pattern, target_account in consolidation_rules.items():
-            if source_pattern in source_account or \
-               re.search(source_pattern, source_account, re.IGNORECASE):
-                return target_account
+        match = self._consolidation_matcher.match(source_account)
+        if match:
+            return match['target_account']
         
         # No consolidation rule found, return normal mapping
         return self.transform_account(source_account) or source_account
\ No newline at end of file
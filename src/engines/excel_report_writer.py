@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Excel Report Writer
+Writes MRI imports and validation reports to XLSX in constant memory
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+
+SheetSource = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
+
+class ExcelReportWriter:
+    """
+    Streams DataFrames into an XLSX workbook, one sheet per artifact
+    Rows are written block by block with typed number and date cells; integer
+    columns (counts) get a whole-number format, other numbers two decimals
+    """
+    
+    def __init__(self, system_config: Dict):
+        self.logger = logging.getLogger(__name__)
+        self.config = system_config
+        self.block_rows = system_config.get('file_settings', {}).get('export_chunk_rows', 10000)
+    
+    def write_workbook(self,
+                       output_path: Path,
+                       sheets: Dict[str, SheetSource],
+                       date_columns: Optional[Dict[str, List[str]]] = None) -> bool:
+        """
+        Write a workbook with one sheet per artifact
+        
+        Args:
+            output_path: Target .xlsx file
+            sheets: Sheet name -> DataFrame, or an iterable of DataFrame chunks
+                (e.g. pd.read_csv(..., chunksize=...)) for sources larger than memory
+            date_columns: Sheet name -> columns to write as Excel dates
+        
+        Returns:
+            True if the workbook was written
+        """
+        try:
+            import xlsxwriter
+            
+            date_columns = date_columns or {}
+            workbook = xlsxwriter.Workbook(str(output_path), {'constant_memory': True})
+            
+            try:
+                formats = {
+                    'header': workbook.add_format({'bold': True}),
+                    'number': workbook.add_format({'num_format': '#,##0.00'}),
+                    'integer': workbook.add_format({'num_format': '#,##0'}),
+                    'date': workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+                }
+                
+                for sheet_name, source in sheets.items():
+                    worksheet = workbook.add_worksheet(sheet_name[:31])
+                    rows = self._write_sheet(worksheet, source, formats, date_columns.get(sheet_name, []))
+                    self.logger.info(f"Wrote {rows} rows to sheet {sheet_name}")
+            finally:
+                workbook.close()
+            
+            self.logger.info(f"Excel report exported to {output_path}")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Error writing Excel report: {e}")
+            return False
+    
+    def _write_sheet(self, worksheet, source: SheetSource, formats: Dict, date_columns: List[str]) -> int:
+        """Write header and rows of one sheet, a block at a time; returns the row count"""
+        chunks = [source] if isinstance(source, pd.DataFrame) else source
+        
+        row_number = 0
+        header_written = False
+        
+        for chunk in chunks:
+            if not header_written:
+                worksheet.write_row(0, 0, [str(col) for col in chunk.columns], formats['header'])
+                header_written = True
+            
+            number_formats = [
+                formats['integer'] if self._is_integer_column(chunk[col]) else formats['number']
+                for col in chunk.columns
+            ]
+            
+            for start in range(0, len(chunk), self.block_rows):
+                block = chunk.iloc[start:start + self.block_rows]
+                for col in date_columns:
+                    if col in block.columns:
+                        block = block.assign(**{col: pd.to_datetime(block[col], errors='coerce')})
+                
+                for values in block.itertuples(index=False, name=None):
+                    row_number += 1
+                    for col_number, value in enumerate(values):
+                        self._write_cell(worksheet, row_number, col_number, value, formats, number_formats[col_number])
+        
+        return row_number
+    
+    def _is_integer_column(self, values: pd.Series) -> bool:
+        """Integer (including nullable Int64) columns, excluding booleans"""
+        return pd.api.types.is_integer_dtype(values) and not pd.api.types.is_bool_dtype(values)
+    
+    def _write_cell(self, worksheet, row: int, col: int, value, formats: Dict, number_format):
+        """Write one typed cell; missing values are left blank"""
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return
+        
+        if isinstance(value, (bool, np.bool_)):
+            worksheet.write_boolean(row, col, bool(value))
+        elif isinstance(value, (int, float, np.integer, np.floating)):
+            worksheet.write_number(row, col, float(value), number_format)
+        elif isinstance(value, pd.Timestamp):
+            worksheet.write_datetime(row, col, value.to_pydatetime(), formats['date'])
+        else:
+            worksheet.write_string(row, col, str(value))
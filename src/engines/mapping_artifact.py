@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Mapping Artifact
+Precompiled, versioned snapshot of the mapping engine's lookup tables
+"""
+
+import os
+import json
+import pickle
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Bump whenever the compiled state layout of AccountMappingEngine changes
+ARTIFACT_VERSION = 3
+
+# Artifacts live in this directory under their content key, one per mapping version
+ARTIFACT_DIRNAME = 'mapping_artifacts'
+
+# Most recently used artifacts kept; older ones are removed when a new one is written
+ARTIFACT_CACHE_SIZE = 8
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(gl_mapping: Dict, mri_chart: Dict) -> str:
+    """
+    SHA-256 of the mapping document, the chart and the artifact version
+    
+    Keyed on content rather than on a file, so gl_mapping.json and a mapping-store
+    version with the same mappings share one artifact.
+    """
+    digest = hashlib.sha256(str(ARTIFACT_VERSION).encode())
+    for document in (gl_mapping, mri_chart):
+        digest.update(json.dumps(document, sort_keys=True, separators=(',', ':'), default=str).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def artifact_path(config_dir: Path, key: str) -> Path:
+    """Location of the artifact for a content key"""
+    return Path(config_dir) / ARTIFACT_DIRNAME / f'{key}.pkl'
+
+
+def load_artifact(config_dir: Path, key: str) -> Optional[Dict]:
+    """
+    Compiled engine state for a content key, if an artifact for it exists
+    
+    Returns:
+        State dict for AccountMappingEngine, or None when missing or unreadable
+    """
+    path = artifact_path(config_dir, key)
+    if not path.exists():
+        return None
+    
+    try:
+        with open(path, 'rb') as f:
+            artifact = pickle.load(f)
+        
+        if artifact.get('key') != key:
+            logger.info(f"Mapping artifact {path} does not match its key, recompiling")
+            return None
+        
+        # Mark as recently used so pruning keeps it
+        os.utime(path)
+        return artifact['state']
+    
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable mapping artifact {path}: {e}")
+        return None
+
+
+def write_artifact(config_dir: Path, key: str, state: Dict) -> Optional[Path]:
+    """Write compiled engine state under its content key (atomically) and prune old artifacts"""
+    path = artifact_path(config_dir, key)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'key': key, 'state': state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+        logger.info(f"Mapping artifact written to {path}")
+        _prune(path.parent)
+        return path
+    
+    except Exception as e:
+        logger.error(f"Error writing mapping artifact {path}: {e}")
+        return None
+
+
+def _prune(directory: Path):
+    """Remove all but the ARTIFACT_CACHE_SIZE most recently used artifacts"""
+    artifacts = sorted(directory.glob('*.pkl'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in artifacts[ARTIFACT_CACHE_SIZE:]:
+        try:
+            stale.unlink()
+        except OSError as e:
+            logger.warning(f"Could not remove old mapping artifact {stale}: {e}")
+
+
+def main():
+    """Compile the mapping artifact from the JSON mapping and chart files"""
+    parser = argparse.ArgumentParser(description='Build the precompiled mapping artifact')
+    parser.add_argument('--mappings-dir', type=Path, default=Path('data/mappings'),
+                        help='Directory with gl_mapping.json and mri_chart_of_accounts.json')
+    args = parser.parse_args()
+    
+    from .account_mapping_engine import AccountMappingEngine
+    
+    engine = AccountMappingEngine(args.mappings_dir, use_artifact=False)
+    key = content_key(engine.gl_mapping, engine.mri_chart)
+    path = write_artifact(args.mappings_dir, key, engine.compiled_state())
+    if path is None:
+        parser.exit(1, 'Failed to write mapping artifact\n')
+    print(f"Compiled {len(engine.exact_targets)} mappings and "
+          f"{len(engine.chart_accounts)} chart accounts into {path}")
+
+
+if __name__ == '__main__':
+    main()
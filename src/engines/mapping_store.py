@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Mapping Store
+Indexed SQLite store for account mapping sets and their effective-dated versions
+"""
+
+import re
+import json
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy import (
+    Column, MetaData, String, Table, Text, and_, create_engine, delete, func, select
+)
+
+
+metadata = MetaData()
+
+# One row per source account of a mapping set version
+account_mappings_table = Table(
+    'account_mappings', metadata,
+    Column('mapping_set', String(64), primary_key=True),
+    Column('effective_period', String(7), primary_key=True),
+    Column('source_account', String(128), primary_key=True),
+    Column('target_account', String(64), nullable=False),
+    Column('description', Text),
+    Column('account_type', String(32))
+)
+
+# Remaining gl_mapping.json sections (patterns, rules, segments...) per version, as JSON
+mapping_sections_table = Table(
+    'mapping_sections', metadata,
+    Column('mapping_set', String(64), primary_key=True),
+    Column('effective_period', String(7), primary_key=True),
+    Column('sections', Text, nullable=False)
+)
+
+
+def normalize_period(period: str) -> str:
+    """Effective periods are stored as sortable YYYY-MM; MM/YY and YYYYMM are accepted"""
+    period = str(period).strip()
+    if re.fullmatch(r'\d{4}-\d{2}', period):
+        return period
+    match = re.fullmatch(r'(\d{1,2})/(\d{2}|\d{4})', period)
+    if match:
+        year = match.group(2) if len(match.group(2)) == 4 else f'20{match.group(2)}'
+        return f'{year}-{int(match.group(1)):02d}'
+    match = re.fullmatch(r'(\d{4})(\d{2})', period)
+    if match:
+        return f'{match.group(1)}-{match.group(2)}'
+    raise ValueError(f"Unrecognized effective period: {period}")
+
+
+class MappingStore:
+    """
+    Account mappings keyed by (mapping_set, effective_period, source_account)
+    
+    A run loads a single mapping set version - the latest one effective on or before
+    its period - through the primary key index, so load cost depends on the size of
+    that version only, not on the whole catalog.
+    """
+    
+    def __init__(self, url: str):
+        """
+        Args:
+            url: SQLAlchemy database URL, e.g. sqlite:///data/mappings/mapping_store.db
+        """
+        self.logger = logging.getLogger(__name__)
+        self.engine = create_engine(url, future=True)
+        metadata.create_all(self.engine)
+    
+    def import_mapping(self,
+                       source: Union[Path, Dict],
+                       mapping_set: str,
+                       effective_period: str) -> int:
+        """
+        Bulk import a gl_mapping.json document as one mapping set version
+        
+        An existing version with the same key is replaced.
+        
+        Returns:
+            Number of account mappings stored
+        """
+        if not isinstance(source, dict):
+            with open(source, 'r') as f:
+                source = json.load(f)
+        
+        effective_period = normalize_period(effective_period)
+        rows = [
+            {
+                'mapping_set': mapping_set,
+                'effective_period': effective_period,
+                'source_account': source_account,
+                'target_account': entry['target_account'],
+                'description': entry.get('description'),
+                'account_type': entry.get('account_type')
+            }
+            for source_account, entry in source.get('account_mappings', {}).items()
+        ]
+        sections = {key: value for key, value in source.items() if key != 'account_mappings'}
+        version_key = and_(
+            account_mappings_table.c.mapping_set == mapping_set,
+            account_mappings_table.c.effective_period == effective_period
+        )
+        
+        with self.engine.begin() as conn:
+            conn.execute(delete(account_mappings_table).where(version_key))
+            conn.execute(delete(mapping_sections_table).where(and_(
+                mapping_sections_table.c.mapping_set == mapping_set,
+                mapping_sections_table.c.effective_period == effective_period
+            )))
+            if rows:
+                conn.execute(account_mappings_table.insert(), rows)
+            conn.execute(mapping_sections_table.insert(), [{
+                'mapping_set': mapping_set,
+                'effective_period': effective_period,
+                'sections': json.dumps(sections)
+            }])
+        
+        self.logger.info(f"Imported {len(rows)} mappings into {mapping_set} effective {effective_period}")
+        return len(rows)
+    
+    def resolve_version(self, mapping_set: str, period: str) -> Optional[str]:
+        """Latest effective period of a mapping set on or before the given period"""
+        query = select(func.max(mapping_sections_table.c.effective_period)).where(and_(
+            mapping_sections_table.c.mapping_set == mapping_set,
+            mapping_sections_table.c.effective_period <= normalize_period(period)
+        ))
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar()
+    
+    def load_mapping(self, mapping_set: str, period: str) -> Optional[Dict]:
+        """
+        Mapping document (gl_mapping.json format) for the version in effect for a period
+        
+        Returns:
+            Mapping dict, or None if the set has no version effective by that period
+        """
+        effective_period = self.resolve_version(mapping_set, period)
+        if effective_period is None:
+            return None
+        
+        with self.engine.connect() as conn:
+            sections = conn.execute(select(mapping_sections_table.c.sections).where(and_(
+                mapping_sections_table.c.mapping_set == mapping_set,
+                mapping_sections_table.c.effective_period == effective_period
+            ))).scalar()
+            rows = conn.execute(select(account_mappings_table).where(and_(
+                account_mappings_table.c.mapping_set == mapping_set,
+                account_mappings_table.c.effective_period == effective_period
+            ))).mappings().all()
+        
+        mapping = json.loads(sections)
+        mapping['account_mappings'] = {
+            row['source_account']: {
+                key: row[key] for key in ['target_account', 'description', 'account_type'] if row[key] is not None
+            }
+            for row in rows
+        }
+        mapping.setdefault('mapping_info', {}).update({
+            'mapping_set': mapping_set,
+            'effective_period': effective_period
+        })
+        return mapping
+    
+    def export_mapping(self, mapping_set: str, period: str, output_path: Optional[Path] = None) -> Optional[Dict]:
+        """Export the version in effect for a period back to gl_mapping.json format"""
+        mapping = self.load_mapping(mapping_set, period)
+        if mapping is not None and output_path is not None:
+            with open(output_path, 'w') as f:
+                json.dump(mapping, f, indent=2, ensure_ascii=False)
+        return mapping
+    
+    def list_versions(self, mapping_set: Optional[str] = None) -> List[Dict]:
+        """Stored mapping set versions with their account counts (versions without accounts included)"""
+        versions = mapping_sections_table
+        accounts = account_mappings_table
+        query = select(
+            versions.c.mapping_set,
+            versions.c.effective_period,
+            func.count(accounts.c.source_account).label('accounts')
+        ).select_from(
+            versions.outerjoin(accounts, and_(
+                accounts.c.mapping_set == versions.c.mapping_set,
+                accounts.c.effective_period == versions.c.effective_period
+            ))
+        ).group_by(
+            versions.c.mapping_set,
+            versions.c.effective_period
+        ).order_by(
+            versions.c.mapping_set,
+            versions.c.effective_period
+        )
+        if mapping_set is not None:
+            query = query.where(versions.c.mapping_set == mapping_set)
+        
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+
+def main():
+    """Command line import/export between gl_mapping.json files and the store"""
+    parser = argparse.ArgumentParser(description='Manage the indexed account mapping store')
+    parser.add_argument('--url', default='sqlite:///data/mappings/mapping_store.db', help='Database URL')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    import_parser = subparsers.add_parser('import', help='Import a gl_mapping.json file as a version')
+    import_parser.add_argument('file', type=Path)
+    import_parser.add_argument('--set', dest='mapping_set', default='default')
+    import_parser.add_argument('--effective', required=True, help='Effective period (YYYY-MM or MM/YY)')
+    
+    export_parser = subparsers.add_parser('export', help='Export the version in effect for a period')
+    export_parser.add_argument('file', type=Path)
+    export_parser.add_argument('--set', dest='mapping_set', default='default')
+    export_parser.add_argument('--period', required=True, help='Period (YYYY-MM or MM/YY)')
+    
+    list_parser = subparsers.add_parser('list', help='List stored versions')
+    list_parser.add_argument('--set', dest='mapping_set')
+    
+    args = parser.parse_args()
+    store = MappingStore(args.url)
+    
+    if args.command == 'import':
+        count = store.import_mapping(args.file, args.mapping_set, args.effective)
+        print(f"Imported {count} mappings into {args.mapping_set}")
+    elif args.command == 'export':
+        if store.export_mapping(args.mapping_set, args.period, args.file) is None:
+            parser.error(f"No version of {args.mapping_set} is effective for {args.period}")
+        print(f"Exported {args.mapping_set} to {args.file}")
+    else:
+        for version in store.list_versions(args.mapping_set):
+            print(f"{version['mapping_set']}\t{version['effective_period']}\t{version['accounts']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Mapping Suggester
+Ranks likely MRI target accounts for source accounts that have no mapping
+"""
+
+import os
+import re
+import math
+import heapq
+import bisect
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+# Character n-gram size used for fuzzy description matching
+NGRAM_SIZE = 3
+
+# Share of the score given to description similarity; the rest rewards matching account numbers
+TEXT_WEIGHT = 0.7
+
+# Targets taken on each side of a source account number in the sorted account numbers
+NUMBER_NEIGHBORS = 16
+
+
+class MappingSuggester:
+    """
+    Inverted index over MRI chart descriptions and existing mappings
+    
+    Each target account is indexed once by the character n-grams and tokens of its
+    chart description and of every source description already mapped to it. A query
+    only touches the postings of its own n-grams, so suggestions cost roughly the
+    length of the description rather than the size of the chart. Account numbers are
+    kept sorted, and a binary search finds the few targets sharing the most leading
+    digits with the source.
+    """
+    
+    def __init__(self, chart_accounts: Dict, account_mappings: Dict):
+        """
+        Args:
+            chart_accounts: mri_chart_of_accounts.json 'accounts' section
+            account_mappings: gl_mapping.json 'account_mappings' section
+        """
+        self.logger = logging.getLogger(__name__)
+        self.targets = {}
+        self.postings = defaultdict(dict)
+        
+        texts = defaultdict(list)
+        for account, info in chart_accounts.items():
+            self.targets[account] = info.get('description', '')
+            texts[account].append(info.get('description', ''))
+        for entry in account_mappings.values():
+            target = entry.get('target_account')
+            if target in self.targets:
+                texts[target].append(entry.get('description', ''))
+        
+        # Binary term vectors per target; idf weights are computed once after indexing
+        self.norms = {}
+        for target, target_texts in texts.items():
+            terms = set()
+            for text in target_texts:
+                terms |= self._terms(text)
+            for term in terms:
+                self.postings[term][target] = 1
+        self.idf = {
+            term: math.log(1 + len(self.targets) / len(postings)) for term, postings in self.postings.items()
+        }
+        for term, postings in self.postings.items():
+            for target in postings:
+                self.norms[target] = self.norms.get(target, 0) + self.idf[term] ** 2
+        
+        # Target account numbers, sorted so the longest shared prefixes are found by bisection
+        self.target_digits = {target: re.sub(r'\D', '', target) for target in self.targets}
+        numbered = sorted((digits, target) for target, digits in self.target_digits.items() if digits)
+        self.number_keys = [digits for digits, _ in numbered]
+        self.numbered_targets = [target for _, target in numbered]
+        
+        self.logger.info(f"Mapping suggestion index built: {len(self.targets)} targets, {len(self.postings)} terms")
+    
+    def _terms(self, text: str) -> set:
+        """Character n-grams of each word plus the whole words themselves"""
+        terms = set()
+        for word in re.findall(r'[a-z0-9&]+', str(text).lower()):
+            terms.add(f'w:{word}')
+            padded = f' {word} '
+            for start in range(max(1, len(padded) - NGRAM_SIZE + 1)):
+                terms.add(padded[start:start + NGRAM_SIZE])
+        return terms
+    
+    def suggest(self, source_account: str, description: str = '', k: int = 3, min_score: float = 0.0) -> List[Dict]:
+        """
+        Top-k target accounts for one source account
+        
+        Args:
+            source_account: Source account code, optionally with ': description'
+            description: Source description; taken from the account string when omitted
+            k: Number of suggestions
+            min_score: Drop candidates scoring below this (0-1)
+        
+        Returns:
+            List of dicts with target_account, description and score, best first
+        """
+        source_account = str(source_account)
+        if not description:
+            description = source_account.split(':', 1)[-1]
+        
+        # Cosine similarity over idf-weighted binary term vectors, via the postings
+        scores = defaultdict(float)
+        query_terms = self._terms(description)
+        query_norm = math.sqrt(sum(self.idf.get(term, 0) ** 2 for term in query_terms)) or 1.0
+        for term in query_terms:
+            weight = self.idf.get(term)
+            if weight is None:
+                continue
+            for target in self.postings[term]:
+                scores[target] += weight * weight
+        
+        for target in scores:
+            scores[target] = TEXT_WEIGHT * scores[target] / (query_norm * math.sqrt(self.norms[target]))
+        
+        # Reward targets whose account number shares leading digits with the source. Numbers
+        # sharing the longest prefix sit next to the source's position in sorted order, so
+        # only that window is added to the candidates already found by description
+        number = re.match(r'\D*(\d+)', source_account)
+        if number:
+            digits = number.group(1)
+            neighbors = max(k, NUMBER_NEIGHBORS)
+            position = bisect.bisect_left(self.number_keys, digits)
+            candidates = set(self.numbered_targets[max(0, position - neighbors):position + neighbors])
+            for target in candidates | set(scores):
+                target_digits = self.target_digits[target]
+                if not target_digits:
+                    continue
+                common = len(os.path.commonprefix([digits, target_digits]))
+                if common:
+                    scores[target] += (1 - TEXT_WEIGHT) * common / max(len(digits), len(target_digits))
+        
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+        return [
+            {'target_account': target, 'description': self.targets[target], 'score': round(score, 4)}
+            for target, score in best if score >= min_score
+        ]
+    
+    def suggest_many(self, accounts: List[str], descriptions: Optional[Dict[str, str]] = None,
+                     k: int = 3, min_score: float = 0.0) -> Dict[str, List[Dict]]:
+        """Suggestions for several source accounts, keyed by account"""
+        descriptions = descriptions or {}
+        return {
+            account: self.suggest(account, descriptions.get(account, ''), k, min_score)
+            for account in accounts
+        }
+
@@ -4,10 +4,14 @@ MRI Import Generator
 Generates MRI-compatible import files from trial balance activity
 """
 
+import re
+import json
+import zipfile
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 import logging
 from pathlib import Path
 
@@ -31,6 +35,10 @@ class MRIImportGenerator:
         """
         Generate MRI import records from activity data
         
+        Records are built column-wise for all rows at once. When the activity data
+        carries an Entity column (consolidated multi-entity trial balances), each
+        record gets its own ENTITYID and entity_id only fills rows without one.
+        
         Args:
             activity_data: DataFrame with account activity
             period: Period in MM/YY format (e.g., "04/25")
@@ -47,76 +55,68 @@ class MRIImportGenerator:
             # Use provided entity_id or default
             entity_id = entity_id or self.entity_config.get('default_entity_id', 'M55020')
             
-            import_records = []
+            # Skip zero activity (already filtered in processor)
+            activity = activity_data[np.abs(activity_data['Activity']) >= 0.01]
+            
+            # Skip rows without a mapped account
+            mapped = activity['MRI_Account'].notna() & (activity['MRI_Account'].astype(str) != '')
+            if not mapped.all():
+                missing = activity.loc[~mapped, 'Account'].tolist() if 'Account' in activity.columns else []
+                self.logger.warning(f"No MRI account mapping for {missing}")
+            activity = activity[mapped]
+            
+            if activity.empty:
+                return self._create_empty_import_df()
             
-            for _, row in activity_data.iterrows():
-                # Skip zero activity (already filtered in processor)
-                if abs(row.get('Activity', 0)) < 0.01:
-                    continue
-                
-                # Create import record
-                record = self._create_import_record(
-                    row=row,
-                    period=period,
-                    entity_id=entity_id
-                )
-                
-                if record:
-                    import_records.append(record)
+            import_df = self._build_import_frame(activity, period, entity_id)
             
-            # Convert to DataFrame
-            import_df = pd.DataFrame(import_records)
+            if 'Entity' in activity.columns:
+                import_df = import_df.sort_values('ENTITYID', kind='stable').reset_index(drop=True)
             
-            if not import_df.empty:
-                # Ensure proper column order
-                import_df = self._ensure_column_order(import_df)
-                # Validate import format
-                self._validate_import_format(import_df)
+            # Ensure proper column order
+            import_df = self._ensure_column_order(import_df)
+            # Validate import format
+            self._validate_import_format(import_df)
             
-            self.logger.info(f"Generated {len(import_df)} MRI import records")
+            self.logger.info(f"Generated {len(import_df)} MRI import records for {import_df['ENTITYID'].nunique()} entities")
             return import_df
             
         except Exception as e:
             self.logger.error(f"Error generating import records: {e}")
             return self._create_empty_import_df()
     
-    def _create_import_record(self, row: pd.Series, period: str, entity_id: str) -> Optional[Dict]:
-        """Create a single MRI import record"""
-        try:
-            # Get mapped account
-            mri_account = row.get('MRI_Account', '')
-            if not mri_account:
-                self.logger.warning(f"No MRI account mapping for {row.get('Account', 'Unknown')}")
-                return None
-            
-            # Calculate amount (activity amount)
-            amount = row.get('Activity', 0)
-            
-            # Create record with all required fields
-            record = {
-                'PERIOD': self._format_period(period),
-                'REF': self.mri_defaults.get('ref'),
-                'SOURCE': self.mri_defaults.get('source', 'GA'),
-                'ENTITYID': entity_id,
-                'ACCTNUM': mri_account,
-                'DEPARTMENT': self.mri_defaults.get('department', '@'),
-                'AMT': round(amount, 2),
-                'DESCRPN': row.get('Description', ''),
-                'ENTRDATE': self._format_entry_date(period),
-                'STATUS': self.mri_defaults.get('status', 'P'),
-                'BASIS': self.mri_defaults.get('basis', 'B'),
-                'AUDITFLAG': self.mri_defaults.get('auditflag'),
-                'ADDLDESC': self.mri_defaults.get('addldesc'),
-                'ASSETCLASS': self.mri_defaults.get('assetclass'),
-                'ASSETCODE': self.mri_defaults.get('assetcode'),
-                'INTERENTITY': self.mri_defaults.get('interentity')
-            }
-            
-            return record
-            
-        except Exception as e:
-            self.logger.error(f"Error creating import record: {e}")
-            return None
+    def _build_import_frame(self, activity: pd.DataFrame, period: str, entity_id: str) -> pd.DataFrame:
+        """Create MRI import records for every activity row in one vectorized pass"""
+        activity = activity.reset_index(drop=True)
+        
+        # Entity and department segments from the source, falling back to defaults
+        entity = pd.Series(entity_id, index=activity.index)
+        if 'Entity' in activity.columns:
+            entity_values = activity['Entity'].fillna('').astype(str)
+            entity = entity_values.where(entity_values != '', entity_id)
+        
+        department = pd.Series(self.mri_defaults.get('department', '@'), index=activity.index)
+        if 'Department' in activity.columns:
+            department = activity['Department'].fillna(department)
+        
+        return pd.DataFrame({
+            'PERIOD': self._format_period(period),
+            'REF': self.mri_defaults.get('ref'),
+            'SOURCE': self.mri_defaults.get('source', 'GA'),
+            'ENTITYID': entity,
+            'ACCTNUM': activity['MRI_Account'],
+            'DEPARTMENT': department,
+            'AMT': activity['Activity'].astype(float).round(2),
+            'DESCRPN': activity['Description'] if 'Description' in activity.columns else '',
+            'ENTRDATE': self._format_entry_date(period),
+            'STATUS': self.mri_defaults.get('status', 'P'),
+            'BASIS': self.mri_defaults.get('basis', 'B'),
+            'AUDITFLAG': self.mri_defaults.get('auditflag'),
+            'ADDLDESC': self.mri_defaults.get('addldesc'),
+            'ASSETCLASS': self.mri_defaults.get('assetclass'),
+            'ASSETCODE': self.mri_defaults.get('assetcode'),
+            'INTERENTITY': self.mri_defaults.get('interentity')
+        }, index=activity.index)
     
     def _format_period(self, period: str) -> str:
         """Format period to MM/YY format"""
@@ -222,18 +222,39 @@ class MRIImportGenerator:
         self.logger.info("MRI import format validation passed")
         return True
     
+    def iter_csv_chunks(self, import_df: pd.DataFrame, chunk_rows: Optional[int] = None) -> Iterator[str]:
+        """
+        Yield the MRI import CSV as text in bounded row chunks
+        
+        The header comes first, then each block of chunk_rows records is serialized on
+        its own, so the full CSV text never has to be held in memory.
+        """
+        if chunk_rows is None:
+            chunk_rows = self.config.get('file_settings', {}).get('export_chunk_rows', 10000)
+        
+        if import_df.empty:
+            import_df = self._create_empty_import_df()
+        
+        yield ','.join(import_df.columns) + '\n'
+        
+        for start in range(0, len(import_df), chunk_rows):
+            yield import_df.iloc[start:start + chunk_rows].to_csv(
+                index=False,
+                header=False,
+                date_format='%Y-%m-%d %H:%M:%S'
+            )
+    
     def export_to_csv(self, import_df: pd.DataFrame, output_path: Path) -> bool:
         """Export MRI import data to CSV"""
         try:
             if import_df.empty:
                 self.logger.warning("No data to export")
-                # Create empty file with headers
-                empty_df = self._create_empty_import_df()
-                empty_df.to_csv(output_path, index=False)
-                return True
             
-            # Export with proper formatting
-            import_df.to_csv(output_path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+            # Export with proper formatting, one chunk at a time
+            with open(output_path, 'w', newline='') as f:
+                for chunk in self.iter_csv_chunks(import_df):
+                    f.write(chunk)
+            
             self.logger.info(f"MRI import file exported to {output_path}")
             return True
             
@@ -241,6 +262,137 @@ class MRIImportGenerator:
             self.logger.error(f"Error exporting MRI import file: {e}")
             return False
     
+    def split_import_records(self,
+                             import_df: pd.DataFrame,
+                             max_rows: Optional[int] = None,
+                             max_bytes: Optional[int] = None,
+                             partition_by: Optional[List[str]] = None) -> List[pd.DataFrame]:
+        """
+        Partition import records into batches that fit MRI import limits
+        
+        Records are first grouped by the partition_by columns (e.g. ENTITYID, PERIOD),
+        then each group is cut so no part exceeds max_rows records or roughly
+        max_bytes of CSV text (estimated from serialized field widths).
+        
+        Returns:
+            List of DataFrames, one per output file, in file order
+        """
+        if import_df.empty:
+            return [import_df]
+        
+        partition_by = [col for col in (partition_by or []) if col in import_df.columns]
+        groups = [group for _, group in import_df.groupby(partition_by, sort=False)] if partition_by else [import_df]
+        
+        parts = []
+        for group in groups:
+            if max_bytes:
+                row_bytes = group.astype(str).replace({'None': '', 'nan': ''}).apply(lambda col: col.str.len()).sum(axis=1)
+                row_bytes = row_bytes.to_numpy() + len(group.columns)
+            else:
+                row_bytes = np.zeros(len(group), dtype=np.int64)
+            
+            part_index = self._assign_parts(row_bytes, max_rows, max_bytes)
+            parts.extend(group.iloc[part_index == i] for i in range(part_index.max() + 1))
+        
+        return parts
+    
+    def _assign_parts(self, row_bytes: np.ndarray, max_rows: Optional[int], max_bytes: Optional[int]) -> np.ndarray:
+        """
+        Part number of each row, filling parts in order
+        
+        A new part starts whenever the next row would take the current one past either
+        budget, so every part respects both. A single row larger than max_bytes gets a
+        part of its own.
+        """
+        part_index = np.empty(len(row_bytes), dtype=np.int64)
+        part, rows, size = 0, 0, 0
+        
+        for i, length in enumerate(row_bytes):
+            if rows and ((max_rows and rows + 1 > max_rows) or (max_bytes and size + length > max_bytes)):
+                part, rows, size = part + 1, 0, 0
+            part_index[i] = part
+            rows += 1
+            size += length
+        
+        return part_index
+    
+    def export_split(self,
+                     import_df: pd.DataFrame,
+                     output_dir: Path,
+                     base_name: str,
+                     max_rows: Optional[int] = None,
+                     max_bytes: Optional[int] = None,
+                     partition_by: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Export MRI import data as numbered CSV files written in parallel, plus a manifest
+        
+        Returns:
+            Manifest dict with per-part row counts and AMT control totals, or None on error
+        """
+        try:
+            split_config = self.config.get('file_settings', {}).get('split_export', {})
+            max_rows = max_rows or split_config.get('max_rows')
+            max_bytes = max_bytes or split_config.get('max_bytes')
+            partition_by = partition_by if partition_by is not None else split_config.get('partition_by', [])
+            max_workers = split_config.get('max_workers', 4)
+            
+            output_dir = Path(output_dir)
+            parts = self.split_import_records(import_df, max_rows, max_bytes, partition_by)
+            paths = [output_dir / f"{base_name}_part{i:03d}.csv" for i in range(1, len(parts) + 1)]
+            
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self.export_to_csv, parts, paths))
+            
+            if not all(results):
+                raise IOError("One or more import parts failed to export")
+            
+            manifest = {
+                'base_name': base_name,
+                'created': datetime.now().isoformat(),
+                'total_records': len(import_df),
+                'total_amount': round(float(pd.to_numeric(import_df['AMT'], errors='coerce').sum()), 2) if not import_df.empty else 0.0,
+                'split_rules': {
+                    'max_rows': max_rows,
+                    'max_bytes': max_bytes,
+                    'partition_by': partition_by
+                },
+                'parts': [
+                    {
+                        'file': path.name,
+                        'records': len(part),
+                        'control_total': round(float(pd.to_numeric(part['AMT'], errors='coerce').sum()), 2) if not part.empty else 0.0,
+                        'entities': sorted(part['ENTITYID'].astype(str).unique().tolist()),
+                        'periods': sorted(part['PERIOD'].astype(str).unique().tolist())
+                    }
+                    for part, path in zip(parts, paths)
+                ]
+            }
+            
+            with open(output_dir / f"{base_name}_manifest.json", 'w') as f:
+                json.dump(manifest, f, indent=2)
+            
+            self.logger.info(f"MRI import split into {len(parts)} files in {output_dir}")
+            return manifest
+            
+        except Exception as e:
+            self.logger.error(f"Error exporting split MRI import: {e}")
+            return None
+    
+    def write_split_archive(self, manifest: Dict, output_dir: Path, archive_path: Path) -> bool:
+        """Bundle the split import files and their manifest into one zip archive"""
+        try:
+            output_dir = Path(output_dir)
+            with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for part in manifest['parts']:
+                    archive.write(output_dir / part['file'], arcname=part['file'])
+                manifest_name = f"{manifest['base_name']}_manifest.json"
+                archive.write(output_dir / manifest_name, arcname=manifest_name)
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error writing split archive: {e}")
+            return False
+    
     def get_import_summary(self, import_df: pd.DataFrame) -> Dict:
         """Get summary statistics for import file"""
         if import_df.empty:
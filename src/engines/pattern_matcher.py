@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Pattern Matcher
+Matches account codes and descriptions against many mapping rules in a single scan
+"""
+
+import re
+import logging
+from collections import deque
+from typing import Dict, List, Optional
+
+
+# Characters that make a rule a regular expression rather than a literal substring
+REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+
+# Numbered/named backreferences and group conditionals, which break when a rule's groups
+# are renumbered by wrapping it in the combined alternation
+GROUP_REFERENCE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+
+class MultiPatternMatcher:
+    """
+    Case-insensitive multi-pattern matcher for description and account rules
+    
+    Literal rules are compiled into an Aho-Corasick automaton; regex rules are combined
+    into one alternation ordered by priority and tried at every position with a
+    lookahead. Each text is therefore scanned once per engine, not once per rule.
+    Lower priority values win; ties go to the rule declared first.
+    """
+    
+    def __init__(self, rules: List[Dict]):
+        """
+        Args:
+            rules: Dicts with name, pattern, target_account and optional priority
+                (defaults to the rule's position in the list)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.rules = []
+        
+        for order, rule in enumerate(rules):
+            pattern = self._simplify_pattern(str(rule['pattern']))
+            self.rules.append({
+                'name': rule['name'],
+                'pattern': pattern,
+                'target_account': rule['target_account'],
+                'priority': (rule.get('priority', order), order),
+                'literal': not (set(pattern) & REGEX_METACHARACTERS)
+            })
+        
+        self._build_automaton([i for i, rule in enumerate(self.rules) if rule['literal']])
+        self._build_combined_regex([i for i, rule in enumerate(self.rules) if not rule['literal']])
+    
+    def _simplify_pattern(self, pattern: str) -> str:
+        """Drop leading/trailing '.*', which do not change a search, so more rules are literal"""
+        # '.*?', '.*+' and '.*{n}' are not a plain '.*'; stripping them would leave a dangling quantifier
+        while pattern.startswith('.*') and pattern[2:3] not in ('?', '+', '*', '{'):
+            pattern = pattern[2:]
+        while pattern.endswith('.*') and not pattern.endswith('\\.*'):
+            pattern = pattern[:-2]
+        return pattern
+    
+    def _build_automaton(self, rule_ids: List[int]):
+        """Build the Aho-Corasick trie, failure links and output sets for literal rules"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+        
+        for rule_id in rule_ids:
+            node = 0
+            for char in self.rules[rule_id]['pattern'].lower():
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._output[node].add(rule_id)
+        
+        # Breadth-first failure links; outputs inherit those of their failure node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] |= self._output[self._fail[child]]
+    
+    def _build_combined_regex(self, rule_ids: List[int]):
+        """
+        Combine regex rules into one priority-ordered alternation
+        
+        Invalid patterns are logged and skipped. Rules with their own named groups or group
+        references are matched one by one, since combining them would clash or renumber.
+        """
+        self._regex_rule_ids = sorted(rule_ids, key=lambda rule_id: self.rules[rule_id]['priority'])
+        self._combined = None
+        self._separate = []
+        combinable = []
+        
+        for rule_id in self._regex_rule_ids:
+            rule = self.rules[rule_id]
+            try:
+                regex = re.compile(rule['pattern'], re.IGNORECASE)
+            except re.error as e:
+                self.logger.error(f"Skipping mapping rule {rule['name']}: invalid pattern {rule['pattern']!r}: {e}")
+                continue
+            
+            if regex.groupindex or GROUP_REFERENCE.search(rule['pattern']):
+                self._separate.append((rule_id, regex))
+            else:
+                combinable.append(rule_id)
+        
+        if not combinable:
+            return
+        
+        alternatives = '|'.join(
+            f"(?P<r{rule_id}>{self.rules[rule_id]['pattern']})" for rule_id in combinable
+        )
+        try:
+            self._combined = re.compile(f"(?=(?:{alternatives}))", re.IGNORECASE)
+        except re.error as e:
+            # Scan the rules one by one rather than lose them
+            self.logger.warning(f"Could not combine regex rules, matching separately: {e}")
+            self._separate.extend(
+                (rule_id, re.compile(self.rules[rule_id]['pattern'], re.IGNORECASE)) for rule_id in combinable
+            )
+    
+    def _scan(self, text: str) -> set:
+        """Ids of all literal rules and the leading regex rule at every position of text"""
+        matched = set()
+        
+        node = 0
+        for char in text.lower():
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            matched |= self._output[node]
+        
+        if self._combined is not None:
+            for match in self._combined.finditer(text):
+                matched.add(int(match.lastgroup[1:]))
+        for rule_id, regex in self._separate:
+            if regex.search(text):
+                matched.add(rule_id)
+        
+        return matched
+    
+    def match_all(self, *texts: str) -> List[Dict]:
+        """
+        Rules matching any of the texts, best first
+        
+        Every literal match is listed; a regex rule is only seen where no higher-priority
+        regex matches at the same position, which never affects the winner.
+        """
+        matched = set()
+        for text in texts:
+            if text:
+                matched |= self._scan(str(text))
+        
+        ranked = sorted(matched, key=lambda rule_id: self.rules[rule_id]['priority'])
+        return [
+            {
+                'rule': self.rules[rule_id]['name'],
+                'target_account': self.rules[rule_id]['target_account'],
+                'priority': self.rules[rule_id]['priority'][0]
+            }
+            for rule_id in ranked
+        ]
+    
+    def match(self, *texts: str) -> Optional[Dict]:
+        """
+        Winning rule for the texts (e.g. account code and description)
+        
+        Returns:
+            Dict with rule, target_account, priority and the other matching rules, or None
+        """
+        candidates = self.match_all(*texts)
+        if not candidates:
+            return None
+        
+        winner = dict(candidates[0])
+        winner['also_matched'] = [candidate['rule'] for candidate in candidates[1:]]
+        return winner
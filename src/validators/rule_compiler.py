@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Validation Rule Compiler
+Turns declarative validation rules from system_config.json into one vectorized evaluation
+"""
+
+import json
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List
+
+
+# Comparison operators usable in column predicates; each maps a Series and an operand to a mask
+PREDICATE_OPERATORS = {
+    'eq': lambda s, v: s == v,
+    'ne': lambda s, v: s != v,
+    'lt': lambda s, v: s < v,
+    'le': lambda s, v: s <= v,
+    'gt': lambda s, v: s > v,
+    'ge': lambda s, v: s >= v,
+    'abs_lt': lambda s, v: s.abs() < v,
+    'abs_le': lambda s, v: s.abs() <= v,
+    'abs_gt': lambda s, v: s.abs() > v,
+    'abs_ge': lambda s, v: s.abs() >= v,
+    'in': lambda s, v: s.isin(v),
+    'not_in': lambda s, v: ~s.isin(v),
+    'matches': lambda s, v: s.astype(str).str.match(v),
+    'notna': lambda s, v: s.notna(),
+    'isna': lambda s, v: s.isna()
+}
+
+# Aggregates usable on either side of an aggregate rule
+AGGREGATES = {
+    'sum': lambda s: s.sum(),
+    'abs_sum': lambda s: s.abs().sum(),
+    'min': lambda s: s.min(),
+    'max': lambda s: s.max(),
+    'abs_max': lambda s: s.abs().max(),
+    'mean': lambda s: s.mean(),
+    'count': lambda s: s.count()
+}
+
+
+class CompiledRule:
+    """
+    A validation rule reduced to vectorized operations over named frames
+    
+    Row and join rules (those with a 'frame') evaluate to a (scope, offending) pair of
+    boolean arrays over that frame; aggregate rules evaluate straight to their outcome.
+    Both take a cache shared by all rules of one evaluation.
+    """
+    
+    def __init__(self, rule: Dict, evaluate: Callable[[Dict[str, pd.DataFrame], Dict], Any]):
+        self.name = rule['name']
+        self.description = rule.get('description', '')
+        self.severity = rule.get('severity', 'FAIL')
+        self.frame = rule.get('frame') if rule.get('type', 'row') in ('row', 'join') else None
+        self.evaluate = evaluate
+        self.frames = sorted({
+            name for name in [rule.get('frame'), rule.get('right'),
+                              rule.get('aggregate', {}).get('frame'), (rule.get('equals') or {}).get('frame')]
+            if name
+        })
+
+
+class CompiledRuleSet:
+    """
+    All compiled rules, evaluated together in one pass per frame
+    
+    The row and join rules over a frame fill one boolean frame (a scope and an offending
+    column per rule), and every rule's counts come from a single column-wise sum of it.
+    Predicates, join lookups and aggregates shared by several rules are computed once.
+    """
+    
+    def __init__(self, rules: List[CompiledRule], sample_size: int = 5):
+        self.rules = rules
+        self.sample_size = sample_size
+    
+    def __iter__(self):
+        return iter(self.rules)
+    
+    def __len__(self):
+        return len(self.rules)
+    
+    def evaluate(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, Dict]:
+        """Outcome of every rule whose frames are all available, keyed by rule name"""
+        cache = {}
+        outcomes = {}
+        by_frame = {}
+        
+        for position, rule in enumerate(self.rules):
+            if any(name not in frames for name in rule.frames):
+                continue
+            if rule.frame is None:
+                outcomes[rule.name] = rule.evaluate(frames, cache)
+            else:
+                by_frame.setdefault(rule.frame, []).append((position, rule))
+        
+        for frame_name, rules in by_frame.items():
+            df = frames[frame_name]
+            columns = {}
+            for position, rule in rules:
+                columns[(position, 'scope')], columns[(position, 'offending')] = rule.evaluate(frames, cache)
+            
+            flags = pd.DataFrame(columns, index=df.index)
+            counts = flags.sum()
+            for position, rule in rules:
+                offending = int(counts[(position, 'offending')])
+                samples = df.iloc[np.flatnonzero(flags[(position, 'offending')].to_numpy())[:self.sample_size]]
+                outcomes[rule.name] = {
+                    'passed': offending == 0,
+                    'rows_checked': int(counts[(position, 'scope')]),
+                    'offending_rows': offending,
+                    'samples': samples.replace({np.nan: None}).to_dict('records')
+                }
+        
+        return outcomes
+
+
+class RuleCompiler:
+    """
+    Compiles the rule language in validation_rules.rules
+    
+    Rule types:
+        row: every row of a frame must satisfy all 'assert' predicates (optionally only
+            rows matching 'where'); offending rows are reported with samples
+        join: rows of 'frame' (optionally only rows matching 'where') must (expect: match)
+            or must not (expect: no_match) have a counterpart in 'right' on the 'on'
+            columns (or 'left_on'/'right_on')
+        aggregate: an aggregate of one frame column must equal another aggregate (or a
+            constant 'value') within 'tolerance'
+    
+    Predicate operands may be literals, another column ('other_column') or a config
+    reference ({"config": "processing_rules.materiality_threshold"}).
+    
+    A rule is left out when its 'enabled_by' validation_rules flag is off, or when the
+    config value named by 'disabled_by' (e.g. "processing_rules.zero_activity_exclude")
+    is set.
+    """
+    
+    def __init__(self, system_config: Dict, sample_size: int = 5):
+        self.logger = logging.getLogger(__name__)
+        self.config = system_config
+        self.sample_size = sample_size
+    
+    def compile(self, rules: List[Dict]) -> CompiledRuleSet:
+        """Compile enabled rules; invalid rules are logged and left out"""
+        validation_rules = self.config.get('validation_rules', {})
+        compiled = []
+        
+        for rule in rules:
+            try:
+                enabled_by = rule.get('enabled_by')
+                if not rule.get('enabled', True) or (enabled_by and not validation_rules.get(enabled_by, False)):
+                    continue
+                if rule.get('disabled_by') and self._config_value(rule['disabled_by']):
+                    continue
+                
+                compilers = {
+                    'row': self._compile_row_rule,
+                    'join': self._compile_join_rule,
+                    'aggregate': self._compile_aggregate_rule
+                }
+                rule_type = rule.get('type', 'row')
+                if rule_type not in compilers:
+                    raise ValueError(f"Unknown rule type: {rule_type}")
+                
+                compiled.append(CompiledRule(rule, compilers[rule_type](rule)))
+            
+            except Exception as e:
+                self.logger.error(f"Could not compile validation rule {rule.get('name')}: {e}")
+        
+        return CompiledRuleSet(compiled, self.sample_size)
+    
+    def _compile_row_rule(self, rule: Dict) -> Callable:
+        """Compile column predicates into one boolean mask expression"""
+        frame_name = rule['frame']
+        where = self._compile_predicates(rule.get('where', []))
+        check = self._compile_predicates(rule['assert'])
+        
+        def evaluate(frames: Dict[str, pd.DataFrame], cache: Dict):
+            df = frames[frame_name]
+            scope = where(df, frame_name, cache)
+            return scope, scope & ~check(df, frame_name, cache)
+        
+        return evaluate
+    
+    def _compile_join_rule(self, rule: Dict) -> Callable:
+        """Compile a cross-frame existence condition into one merge with an indicator"""
+        frame_name = rule['frame']
+        right_name = rule['right']
+        left_on = rule.get('left_on', rule.get('on'))
+        right_on = rule.get('right_on', rule.get('on'))
+        left_on = [left_on] if isinstance(left_on, str) else list(left_on)
+        right_on = [right_on] if isinstance(right_on, str) else list(right_on)
+        expect = rule.get('expect', 'match')
+        where = self._compile_predicates(rule.get('where', []))
+        
+        if expect not in ('match', 'no_match'):
+            raise ValueError(f"Unknown join expectation: {expect}")
+        
+        lookup = (frame_name, 'join', right_name, tuple(left_on), tuple(right_on))
+        
+        def evaluate(frames: Dict[str, pd.DataFrame], cache: Dict):
+            df = frames[frame_name]
+            if lookup not in cache:
+                keys = frames[right_name][right_on].drop_duplicates()
+                keys.columns = left_on
+                merged = df[left_on].merge(keys, on=left_on, how='left', indicator=True)
+                cache[lookup] = (merged['_merge'] == 'both').to_numpy()
+            
+            matched = cache[lookup]
+            scope = where(df, frame_name, cache)
+            return scope, scope & (~matched if expect == 'match' else matched)
+        
+        return evaluate
+    
+    def _compile_aggregate_rule(self, rule: Dict) -> Callable:
+        """Compile an aggregate comparison with a tolerance"""
+        left = rule['aggregate']
+        right = rule.get('equals')
+        tolerance = self._resolve_operand(rule.get('tolerance', 0))
+        
+        for side in [left, right or {}]:
+            if side.get('agg', 'sum') not in AGGREGATES:
+                raise ValueError(f"Unknown aggregate: {side.get('agg')}")
+        
+        def aggregate(frames: Dict[str, pd.DataFrame], cache: Dict, side: Dict) -> float:
+            if 'value' in side:
+                return float(self._resolve_operand(side['value']))
+            key = (side['frame'], 'aggregate', side['column'], side.get('agg', 'sum'))
+            if key not in cache:
+                series = pd.to_numeric(frames[side['frame']][side['column']], errors='coerce')
+                value = AGGREGATES[side.get('agg', 'sum')](series)
+                cache[key] = 0.0 if pd.isna(value) else float(value)
+            return cache[key]
+        
+        def evaluate(frames: Dict[str, pd.DataFrame], cache: Dict) -> Dict:
+            actual = aggregate(frames, cache, left)
+            expected = aggregate(frames, cache, right) if right is not None else 0.0
+            variance = abs(actual - expected)
+            return {
+                'passed': variance <= tolerance,
+                'actual': actual,
+                'expected': expected,
+                'variance': variance,
+                'tolerance': tolerance
+            }
+        
+        return evaluate
+    
+    def _compile_predicates(self, predicates: List[Dict]) -> Callable[[pd.DataFrame, str, Dict], np.ndarray]:
+        """AND a list of predicates into a single mask function; each predicate is computed once per frame"""
+        compiled = [
+            (json.dumps(predicate, sort_keys=True, default=str), self._compile_predicate(predicate))
+            for predicate in predicates
+        ]
+        
+        def mask(df: pd.DataFrame, frame_name: str, cache: Dict) -> np.ndarray:
+            result = np.ones(len(df), dtype=bool)
+            for key, predicate in compiled:
+                key = (frame_name, 'predicate', key)
+                if key not in cache:
+                    cache[key] = predicate(df).fillna(False).astype(bool).to_numpy()
+                result &= cache[key]
+            return result
+        
+        return mask
+    
+    def _compile_predicate(self, predicate: Dict) -> Callable[[pd.DataFrame], pd.Series]:
+        """Compile one column predicate"""
+        column = predicate['column']
+        op = predicate.get('op', 'eq')
+        if op not in PREDICATE_OPERATORS:
+            raise ValueError(f"Unknown predicate operator: {op}")
+        
+        operator = PREDICATE_OPERATORS[op]
+        other_column = predicate.get('other_column')
+        value = self._resolve_operand(predicate.get('value'))
+        tolerance = self._resolve_operand(predicate.get('tolerance'))
+        
+        def evaluate(df: pd.DataFrame) -> pd.Series:
+            series = df[column]
+            if other_column is None:
+                return operator(series, value)
+            
+            other = df[other_column]
+            if tolerance is not None and op in ('eq', 'ne'):
+                within = (series - other).abs() <= tolerance
+                return within if op == 'eq' else ~within
+            return operator(series, other)
+        
+        return evaluate
+    
+    def _resolve_operand(self, value):
+        """Resolve {"config": "section.key"} references against the system config"""
+        if isinstance(value, dict) and 'config' in value:
+            resolved = self._config_value(value['config'])
+            if resolved == {}:
+                raise ValueError(f"Unknown config reference: {value['config']}")
+            return resolved
+        return value
+    
+    def _config_value(self, path: str):
+        """Config value at a dotted path, or {} when it is not set"""
+        resolved = self.config
+        for part in path.split('.'):
+            resolved = resolved.get(part, {}) if isinstance(resolved, dict) else {}
+        return resolved
@@ -6,10 +6,13 @@ Comprehensive validation framework replicating Excel validation sheets
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+from .rule_compiler import RuleCompiler
+
 
 class ValidationEngine:
     """
@@ -22,15 +25,30 @@ class ValidationEngine:
         self.config = system_config
         self.validation_rules = system_config.get('validation_rules', {})
         self.processing_rules = system_config.get('processing_rules', {})
+        self.compiled_rules = RuleCompiler(system_config).compile(self.validation_rules.get('rules', []))
         
     def validate_pre_import(self, 
                            prior_tb: pd.DataFrame,
                            current_tb: pd.DataFrame,
                            activity_data: pd.DataFrame,
-                           account_mappings: Dict) -> Dict:
+                           account_mappings: Dict,
+                           parallel: Optional[bool] = None,
+                           fail_fast: Optional[bool] = None,
+                           chart: Optional[pd.DataFrame] = None) -> Dict:
         """
         Comprehensive pre-import validation
         
+        Args:
+            chart: MRI chart frame indexed by account (AccountMappingEngine.get_chart_frame),
+                exposed to declarative rules as the 'chart' frame with an 'account' column
+            parallel: Run the independent checks concurrently on a thread pool
+                (defaults to validation_rules.parallel_validators)
+            fail_fast: Stop scheduling checks once one FAILs; checks that never ran
+                are reported as SKIPPED (defaults to validation_rules.fail_fast). Run
+                sequentially, the checks after the first failure are skipped; run in
+                parallel, only checks still waiting for a worker are, so which ones (if
+                any) depends on timing
+        
         Returns:
             Validation results with pass/fail status and details
         """
@@ -41,25 +59,37 @@ class ValidationEngine:
         }
         
         try:
-            # 1. Account Mapping Validation
-            mapping_result = self._validate_account_mappings(prior_tb, current_tb, account_mappings)
-            validation_results['validations']['account_mapping'] = mapping_result
-            
-            # 2. Balance Reconciliation
-            balance_result = self._validate_balance_reconciliation(prior_tb, current_tb, activity_data)
-            validation_results['validations']['balance_reconciliation'] = balance_result
-            
-            # 3. Activity Calculation Validation
-            activity_result = self._validate_activity_calculation(prior_tb, current_tb, activity_data)
-            validation_results['validations']['activity_calculation'] = activity_result
-            
-            # 4. Materiality Threshold Check
-            materiality_result = self._validate_materiality_threshold(activity_data)
-            validation_results['validations']['materiality_threshold'] = materiality_result
+            if parallel is None:
+                parallel = self.validation_rules.get('parallel_validators', False)
+            if fail_fast is None:
+                fail_fast = self.validation_rules.get('fail_fast', False)
+            
+            # All checks share shallow views of the caller's frames instead of copies
+            prior_tb, current_tb, activity_data = [
+                self._shared_view(df) for df in (prior_tb, current_tb, activity_data)
+            ]
             
-            # 5. Data Quality Checks
-            quality_result = self._validate_data_quality(prior_tb, current_tb)
-            validation_results['validations']['data_quality'] = quality_result
+            checks = [
+                ('account_mapping', lambda: self._validate_account_mappings(prior_tb, current_tb, account_mappings)),
+                ('balance_reconciliation', lambda: self._validate_balance_reconciliation(prior_tb, current_tb, activity_data)),
+                ('activity_calculation', lambda: self._validate_activity_calculation(prior_tb, current_tb, activity_data)),
+                ('materiality_threshold', lambda: self._validate_materiality_threshold(activity_data)),
+                ('data_quality', lambda: self._validate_data_quality(prior_tb, current_tb))
+            ]
+            if self.compiled_rules:
+                checks.append(('declarative_rules', lambda: self._validate_declarative_rules(prior_tb, current_tb, activity_data, chart)))
+            
+            if parallel:
+                results = self._run_checks_concurrently(checks, fail_fast)
+            else:
+                results = self._run_checks_sequentially(checks, fail_fast)
+            
+            # Merge in declaration order so results do not depend on completion order
+            for name, _ in checks:
+                validation_results['validations'][name] = results.get(name, {
+                    'status': 'SKIPPED',
+                    'details': 'Skipped after a blocking validation failure'
+                })
             
             # Determine overall status
             failed_validations = [
@@ -80,6 +110,51 @@ class ValidationEngine:
             validation_results['error'] = str(e)
             return validation_results
     
+    def _shared_view(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Shallow copy of an input frame, shared by all checks of one validation
+        
+        The view shares the caller's data without copying it, so checks must treat their
+        inputs as read-only: they derive new frames (merge, filter, assign) rather than
+        writing into them, which is also what makes running them concurrently safe.
+        """
+        return df.copy(deep=False) if df is not None else df
+    
+    def _run_checks_sequentially(self, checks: List[Tuple[str, Callable[[], Dict]]], fail_fast: bool) -> Dict:
+        """Run checks one after another, stopping at the first FAIL when fail_fast is set"""
+        results = {}
+        for name, check in checks:
+            results[name] = check()
+            if fail_fast and results[name]['status'] == 'FAIL':
+                break
+        return results
+    
+    def _run_checks_concurrently(self, checks: List[Tuple[str, Callable[[], Dict]]], fail_fast: bool) -> Dict:
+        """
+        Run checks on a thread pool; with fail_fast, checks not yet started are cancelled on a FAIL
+        
+        Cancellation is best effort: checks already running finish and are reported, so
+        with as many workers as checks nothing is skipped.
+        """
+        results = {}
+        max_workers = self.validation_rules.get('validator_workers', len(checks))
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(checks)))) as executor:
+            futures = {executor.submit(check): name for name, check in checks}
+            
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                
+                name = futures[future]
+                results[name] = future.result()
+                
+                if fail_fast and results[name]['status'] == 'FAIL':
+                    for pending in futures:
+                        pending.cancel()
+        
+        return results
+    
     def _validate_account_mappings(self, 
                                   prior_tb: pd.DataFrame,
                                   current_tb: pd.DataFrame,
@@ -125,6 +200,18 @@ class ValidationEngine:
                 'details': 'Error validating account mappings'
             }
     
+    def _balance_keys(self, tb: pd.DataFrame) -> List[str]:
+        """Columns identifying one balance line in a trial balance"""
+        return [col for col in ['Entity', 'Account', 'Department'] if col in tb.columns]
+    
+    def _balance_row_mask(self, tb: pd.DataFrame, row: pd.Series) -> pd.Series:
+        """Mask selecting the trial balance line(s) matching an activity row"""
+        mask = tb['Account'] == row['Account']
+        for dimension in ['Entity', 'Department']:
+            if dimension in tb.columns and dimension in row.index:
+                mask &= tb[dimension] == row[dimension]
+        return mask
+    
     def _validate_balance_reconciliation(self,
                                        prior_tb: pd.DataFrame,
                                        current_tb: pd.DataFrame,
@@ -139,11 +226,11 @@ class ValidationEngine:
                 calculated_activity = activity_row['Activity']
                 
                 # Get prior balance
-                prior_row = prior_tb[prior_tb['Account'] == account]
+                prior_row = prior_tb[self._balance_row_mask(prior_tb, activity_row)]
                 prior_balance = prior_row['Net'].iloc[0] if not prior_row.empty else 0
                 
                 # Get current balance
-                current_row = current_tb[current_tb['Account'] == account]
+                current_row = current_tb[self._balance_row_mask(current_tb, activity_row)]
                 current_balance = current_row['Net'].iloc[0] if not current_row.empty else 0
                 
                 # Calculate expected activity
@@ -196,8 +283,10 @@ class ValidationEngine:
                 reported_activity = row['Activity']
                 
                 # Get balances
-                prior_net = prior_tb[prior_tb['Account'] == account]['Net'].iloc[0] if not prior_tb[prior_tb['Account'] == account].empty else 0
-                current_net = current_tb[current_tb['Account'] == account]['Net'].iloc[0] if not current_tb[current_tb['Account'] == account].empty else 0
+                prior_rows = prior_tb[self._balance_row_mask(prior_tb, row)]
+                current_rows = current_tb[self._balance_row_mask(current_tb, row)]
+                prior_net = prior_rows['Net'].iloc[0] if not prior_rows.empty else 0
+                current_net = current_rows['Net'].iloc[0] if not current_rows.empty else 0
                 
                 # Calculate activity
                 calculated_activity = current_net - prior_net
@@ -271,12 +360,12 @@ class ValidationEngine:
             if current_tb['Account'].isna().any():
                 quality_issues.append("Missing account codes in current TB")
             
-            # Check for duplicate accounts
-            prior_duplicates = prior_tb[prior_tb['Account'].duplicated()]
+            # Check for duplicate accounts (per department when balances are split by department)
+            prior_duplicates = prior_tb[prior_tb.duplicated(self._balance_keys(prior_tb))]
             if not prior_duplicates.empty:
                 quality_issues.append(f"Duplicate accounts in prior TB: {len(prior_duplicates)}")
             
-            current_duplicates = current_tb[current_tb['Account'].duplicated()]
+            current_duplicates = current_tb[current_tb.duplicated(self._balance_keys(current_tb))]
             if not current_duplicates.empty:
                 quality_issues.append(f"Duplicate accounts in current TB: {len(current_duplicates)}")
             
@@ -303,6 +392,152 @@ class ValidationEngine:
                 'details': 'Error validating data quality'
             }
     
+    def _validate_declarative_rules(self,
+                                    prior_tb: pd.DataFrame,
+                                    current_tb: pd.DataFrame,
+                                    activity_data: pd.DataFrame,
+                                    chart: Optional[pd.DataFrame] = None) -> Dict:
+        """Evaluate the compiled validation_rules.rules against one shared set of frames"""
+        try:
+            frames = {
+                'prior': prior_tb,
+                'current': current_tb,
+                'activity': activity_data,
+                'joined': self._build_rule_frame(prior_tb, current_tb, activity_data)
+            }
+            if chart is not None:
+                frames['chart'] = chart.rename_axis('account').reset_index()
+            
+            # All rules are evaluated together; results are reported in declaration order
+            outcomes = self.compiled_rules.evaluate(frames)
+            
+            rule_results = {}
+            for rule in self.compiled_rules:
+                missing = [name for name in rule.frames if name not in frames]
+                if missing:
+                    rule_results[rule.name] = {
+                        'status': 'SKIPPED',
+                        'description': rule.description,
+                        'details': f"Frames not available: {', '.join(missing)}"
+                    }
+                    continue
+                
+                outcome = dict(outcomes[rule.name])
+                passed = outcome.pop('passed')
+                rule_results[rule.name] = {
+                    'status': 'PASS' if passed else rule.severity,
+                    'description': rule.description,
+                    **outcome
+                }
+            
+            failed_rules = [name for name, result in rule_results.items() if result['status'] == 'FAIL']
+            warned_rules = [name for name, result in rule_results.items() if result['status'] == 'WARNING']
+            
+            return {
+                'status': 'FAIL' if failed_rules else 'WARNING' if warned_rules else 'PASS',
+                'rules_evaluated': len(rule_results),
+                'failed_rules': failed_rules,
+                'warning_rules': warned_rules,
+                'rules': rule_results,
+                'details': f"Evaluated {len(rule_results)} declarative rules"
+            }
+            
+        except Exception as e:
+            return {
+                'status': 'ERROR',
+                'error': str(e),
+                'details': 'Error evaluating declarative validation rules'
+            }
+    
+    def validate_chart_compliance(self,
+                                  import_df: pd.DataFrame,
+                                  chart: pd.DataFrame,
+                                  source_types: Optional[pd.DataFrame] = None) -> Dict:
+        """
+        Check every MRI import line against the chart of accounts in one merge
+        
+        Args:
+            import_df: MRI import frame (ACCTNUM, DEPARTMENT)
+            chart: Chart frame indexed by account (type, active, dp_restriction)
+            source_types: target_account / expected_chart_type pairs from the GL mapping
+        
+        Returns:
+            Result flagging unknown and inactive accounts, department restrictions and
+            balance-sheet/P&L type mismatches, with sample lines for each
+        """
+        try:
+            lines = import_df[['ACCTNUM', 'DEPARTMENT']].merge(
+                chart, left_on='ACCTNUM', right_index=True, how='left', indicator=True
+            )
+            
+            unknown = lines['_merge'] == 'left_only'
+            inactive = ~unknown & (lines['active'].astype(str).str.upper() != 'Y')
+            
+            # dp_restriction lists the departments an account may be posted to
+            allowed = chart['dp_restriction'].dropna()
+            allowed = allowed.map(lambda value: value if isinstance(value, list) else str(value).split(','))
+            allowed = allowed.explode().astype(str).str.strip()
+            allowed_pairs = pd.DataFrame({'ACCTNUM': allowed.index, 'DEPARTMENT': allowed.values}).drop_duplicates()
+            permitted = lines[['ACCTNUM', 'DEPARTMENT']].astype(str).merge(
+                allowed_pairs, on=['ACCTNUM', 'DEPARTMENT'], how='left', indicator='_permitted'
+            )['_permitted'].to_numpy() == 'both'
+            restricted = lines['dp_restriction'].notna() & ~permitted
+            
+            # Type mismatch: a source account type that belongs on the other side of the chart
+            type_mismatch = pd.Series(False, index=lines.index)
+            if source_types is not None and not source_types.empty:
+                expected = source_types.merge(chart[['type']], left_on='target_account', right_index=True)
+                mismatched = expected.loc[
+                    expected['expected_chart_type'].notna() & (expected['expected_chart_type'] != expected['type']),
+                    'target_account'
+                ]
+                type_mismatch = lines['ACCTNUM'].isin(mismatched)
+            
+            issues = {
+                'unknown_accounts': unknown,
+                'inactive_accounts': inactive,
+                'department_restrictions': restricted,
+                'type_mismatches': type_mismatch
+            }
+            
+            result = {
+                'status': 'PASS' if not any(mask.any() for mask in issues.values()) else 'FAIL',
+                'lines_checked': len(lines),
+                'details': f"Checked {len(lines)} import lines against {len(chart)} chart accounts"
+            }
+            for issue, mask in issues.items():
+                result[issue] = int(mask.sum())
+                if mask.any():
+                    result[f'{issue}_samples'] = sorted(lines.loc[mask.to_numpy(), 'ACCTNUM'].astype(str).unique())[:10]
+            
+            return result
+            
+        except Exception as e:
+            return {
+                'status': 'ERROR',
+                'error': str(e),
+                'details': 'Error validating chart of accounts compliance'
+            }
+    
+    def _build_rule_frame(self,
+                          prior_tb: pd.DataFrame,
+                          current_tb: pd.DataFrame,
+                          activity_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Join activity to its prior and current balance lines once for all rules
+        
+        Adds Prior_Balance, Current_Balance and Balance_Change columns.
+        """
+        joined = activity_data
+        for tb, column in [(prior_tb, 'Prior_Balance'), (current_tb, 'Current_Balance')]:
+            keys = [key for key in self._balance_keys(tb) if key in activity_data.columns]
+            balances = tb[keys + ['Net']].drop_duplicates(keys).rename(columns={'Net': column})
+            joined = joined.merge(balances, on=keys, how='left')
+            joined[column] = joined[column].fillna(0)
+        
+        joined['Balance_Change'] = joined['Current_Balance'] - joined['Prior_Balance']
+        return joined
+    
     def generate_variance_report(self,
                                 operator_balances: pd.DataFrame,
                                 system_balances: pd.DataFrame,
@@ -386,6 +621,37 @@ class ValidationEngine:
             self.logger.error(f"Error generating variance report: {e}")
             return pd.DataFrame()
     
+    def get_validation_frame(self, validation_results: Dict) -> pd.DataFrame:
+        """
+        Flatten validation results into one row per validation for tabular reports
+        
+        Returns:
+            DataFrame with validation name, status, details and scalar metrics
+        """
+        rows = []
+        for validation_name, result in validation_results.get('validations', {}).items():
+            row = {
+                'Validation': validation_name.replace('_', ' ').title(),
+                'Status': result.get('status'),
+                'Details': result.get('details', ''),
+                'Warning': result.get('warning', '')
+            }
+            # Keep scalar metrics (counts, rates, tolerances); nested samples stay in the JSON
+            for key, value in result.items():
+                if key not in ('status', 'details', 'warning') and isinstance(value, (int, float, str)):
+                    row[key] = value
+            rows.append(row)
+        
+        frame = pd.DataFrame(rows)
+        
+        # Counts stay integers even where other validations leave the column blank
+        for col in frame.columns:
+            values = [row[col] for row in rows if col in row]
+            if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+                frame[col] = frame[col].astype('Int64')
+        
+        return frame
+    
     def get_validation_summary(self, validation_results: Dict) -> str:
         """Generate human-readable validation summary"""
         try: